@@ -5,9 +5,11 @@
 
 from __future__ import print_function, division
 import argparse
+import math
 import re
 import sys
-from nctools import bbox, dxf, ent, gerbernc, utils
+import numpy as np
+from nctools import bbox, dxf, ent, gerbernc, order, utils
 
 __version__ = '1.12-beta'
 
@@ -54,59 +56,113 @@ def _cutline(e, wr):
     wr.up()
 
 
-def _cutarc(e, wr):
+def _cutarc(e, wr, pnts):
     """Cut an ent.Arc
 
     :param ent: nctools.ent.Arc
     :param wr: nctoos.gerbernc.Writer
+    :param pnts: array of points that approximates the arc, or None to cut
+        the arc with arc commands
     """
-    pnts = e.segments()
-    x, y = pnts.pop(0)
-    wr.moveto(x, y)
-    wr.down()
-    for x, y in pnts:
-        wr.moveto(x, y)
-    wr.up()
+    if pnts is None:
+        wr.moveto(e.x[0], e.y[0])
+        wr.down()
+        wr.arcto(e.x[1], e.y[1], e.cx, e.cy, e.ccw)
+        wr.up()
+    else:
+        wr.cut_path(pnts)
 
 
-def _cutcontour(e, wr):
+def _cutcontour(e, wr, pnts):
     """Cut a ent.Contour
 
     :param ent: nctools.ent.Contour
     :param wr: nctoos.gerbernc.Writer
+    :param pnts: dictionary of arrays of points that approximate the arcs,
+        keyed by the id of the arcs, or None to cut the arcs with arc
+        commands
     """
-    wr.moveto(e.entities[0].x[0], e.entities[0].y[0])
-    wr.down()
+    path = [[(e.entities[0].x[0], e.entities[0].y[0])]]
+    if pnts is None:
+        wr.moveto(*path[0][0])
+        wr.down()
+        lines, (px, py) = [], path[0][0]
+        for ce in e.entities:
+            if isinstance(ce, ent.Arc):
+                wr.moveto_many(lines)
+                (sx, ex), (sy, ey), ccw = ce.x, ce.y, ce.ccw
+                # Since contours are found with a tolerance, a short arc
+                # can be connected the wrong way around. Cutting it from
+                # its end point would make it a full circle.
+                if math.hypot(ex - px, ey - py) < math.hypot(sx - px, sy - py):
+                    ex, ey, ccw = sx, sy, not ccw
+                wr.arcto(ex, ey, ce.cx, ce.cy, ccw)
+                lines, (px, py) = [], (ex, ey)
+            elif isinstance(ce, ent.Line):
+                lines.append((ce.x[1], ce.y[1]))
+                px, py = ce.x[1], ce.y[1]
+        wr.moveto_many(lines)
+        wr.up()
+        return
     for ce in e.entities:
         if isinstance(ce, ent.Arc):
-            pnts = ce.segments()
-            pnts.pop(0)
-            for x, y in pnts:
-                wr.moveto(x, y)
+            path.append(pnts[id(ce)][1:])
         elif isinstance(ce, ent.Line):
-            wr.moveto(ce.x[1], ce.y[1])
-    wr.up()
+            path.append([(ce.x[1], ce.y[1])])
+    wr.cut_path(np.concatenate(path))
 
 
-def write_entities(fn, parts, alim):
+def _layerkey(name):
+    """Sort key for layer names. Names that start with a number are sorted
+    by the integer value of that number, before all other names.
+
+    :param name: layer name
+    :returns: sort key
+    """
+    m = re.match('[0-9]+', name)
+    if m:
+        return (0, int(m.group()), name)
+    return (1, 0, name)
+
+
+def write_entities(fn, parts, alim, tol=None, arctol=None, windows=None):
     """Write all parts to a NC file.
 
     :param fn: output file name
     :param parts: list of list of entities
     :param alim: minimum turning angle where the knife needs to be lifted
+    :param tol: if not None, remove redundant commands, moving the cuts by
+        at most this distance in mm. See gerbernc.optimize.
+    :param arctol: if not None, cut arcs with arc commands, and also runs
+        of lines that lie within this distance in mm from an arc.
+    :param windows: if not None, the numbers of the windows that the parts
+        are in, in ascending order. The conveyor is moved once for every
+        window boundary between parts.
+    :returns: dictionary with the numbers of removed commands
     """
-    with gerbernc.Writer(fn, anglim=alim) as w:
-        for p in parts:
+    with gerbernc.Writer(fn, anglim=alim, optimize=tol, arcs=arctol) as w:
+        for n, p in enumerate(parts):
+            if windows is not None and n > 0:
+                for _ in range(windows[n] - windows[n-1]):
+                    w.conveyor()
             w.newpiece()
+            pnts = None
+            if arctol is None:
+                # Flatten all arcs in the part in one go.
+                ce = [c for e in p if isinstance(e, ent.Contour)
+                      for c in e.entities]
+                arcs = [e for e in p + ce if isinstance(e, ent.Arc)]
+                pnts = dict(zip(map(id, arcs), ent.flatten(arcs)))
             for e in p:
                 if isinstance(e, ent.Contour):
-                    _cutcontour(e, w)
+                    _cutcontour(e, w, pnts)
                 elif isinstance(e, ent.Arc):
-                    _cutarc(e, w)
+                    _cutarc(e, w, None if pnts is None else pnts[id(e)])
                 elif isinstance(e, ent.Line):
                     _cutline(e, w)
                 else:
                     raise ValueError('unknown entity')
+    return w.removed
 
 
 def main(argv):
@@ -120,12 +176,53 @@ def main(argv):
     argtxt2 = u"""minimum rotation angle in degrees where the knife needs
     to be lifted to prevent breaking (defaults to 60°)"""
     argtxt4 = "assemble connected lines into contours (off by default)"
+    argtxt6 = """remove redundant NC commands, moving cuts by at most F mm
+    (off by default)"""
+    argtxt7 = """cut arcs with G02/G03 commands, as well as lines that lie
+    within F mm from an arc (off by default, not supported by all
+    cutters)"""
+    argtxt8 = """reorder the cuts in every layer to reduce the movements with
+    the knife raised (off by default)"""
+    argtxt9 = """width in mm of the bands in the x direction that are cut
+    one after another when reordering (defaults to 500 mm)"""
+    argtxt10 = """enter closed contours at the vertex nearest to the previous
+    cut, preferably at a sharp corner (off by default)"""
+    argtxt11 = """assemble connected entities into the smallest number of
+    contours, also where more than two entities meet (off by default)"""
+    argtxt12 = """remove duplicate lines and arcs, and the parts of lines and
+    arcs that overlap (off by default)"""
+    argtxt13 = """cut the drawing in windows of F mm in the x direction,
+    moving the conveyor between them (off by default)"""
+    argtxt5 = """regular expression that selects the layers to cut (defaults
+    to layers whose names start with a number)"""
     parser.add_argument('-l', '--limit', help=argtxt, dest='limit',
                         metavar='F', type=float, default=0.5)
     parser.add_argument('-a', '--angle', help=argtxt2, dest='ang',
                         metavar='F', type=float, default=60)
     parser.add_argument('-c', '--contours', help=argtxt4, dest='contours',
                         action="store_true")
+    parser.add_argument('-d', '--dedupe', help=argtxt12, dest='dedupe',
+                        action="store_true")
+    parser.add_argument('-t', '--trails', help=argtxt11, dest='trails',
+                        action="store_true")
+    parser.add_argument('--layers', help=argtxt5, dest='layers',
+                        metavar='RE', type=utils.regex, default='^[0-9]+')
+    argtxt3 = """read the file without using or filling the cache of
+    parsed files"""
+    parser.add_argument('--no-cache', help=argtxt3, dest='cache',
+                        action='store_false')
+    parser.add_argument('-O', '--optimize', help=argtxt6, dest='optimize',
+                        metavar='F', type=float, default=None)
+    parser.add_argument('--arcs', help=argtxt7, dest='arcs',
+                        metavar='F', type=float, default=None)
+    parser.add_argument('-r', '--reorder', help=argtxt8, dest='reorder',
+                        action="store_true")
+    parser.add_argument('-s', '--seams', help=argtxt10, dest='seams',
+                        action="store_true")
+    parser.add_argument('-w', '--window', help=argtxt13, dest='window',
+                        metavar='F', type=float, default=None)
+    parser.add_argument('--band', help=argtxt9, dest='band',
+                        metavar='F', type=float, default=500)
     group = parser.add_mutually_exclusive_group()
     group.add_argument('-L', '--license', action=LicenseAction, nargs=0,
                        help="print the license")
@@ -141,21 +238,17 @@ def main(argv):
         parser.print_help()
         sys.exit(0)
     for f in utils.xpand(pv.files):
-        parts = []
+        parts, windows = [], []
         msg.say('Starting file "{}"'.format(f))
         try:
             ofn = utils.outname(f, extension='')
-            entities = dxf.reader(f)
+            entities = dxf.reader(f, layers=pv.layers, cache=pv.cache)
         except Exception as ex:  # pylint: disable=W0703
             utils.skip(ex, f)
             continue
         # separate entities into parts according to their layers
-        layers = {e.layer for e in entities}
-        # Delete layer names that are not numbers
-        layers = [la for la in layers if re.search('^[0-9]+', la)]
-        layers.sort(key=lambda x: int(x))  # sort by integer value!
-        # remove entities from unused layers.
-        entities = [e for e in entities if e.layer in layers]
+        layers = list({e.layer for e in entities})
+        layers.sort(key=_layerkey)
         num = len(entities)
         if num == 0:
             msg.say('No entities found!')
@@ -170,23 +263,77 @@ def main(argv):
             for layer in layers:
                 msg.say('Found layer: "{}"'.format(layer))
                 le = [e for e in entities if e.layer == layer]
-                if pv.contours:
+                if pv.dedupe:
+                    msg.say('Removing duplicate and overlapping entities')
+                    removed = {}
+                    le = ent.dedupe(le, lim, removed)
+                    rs = 'Removed {} duplicate and trimmed {} overlapping' \
+                        ' entities, {:.0f} mm'
+                    msg.say(rs.format(removed['duplicate'], removed['overlap'],
+                                      removed['length']))
+                if pv.trails:
+                    msg.say('Assembling connected entities into trails')
+                    # Compare with the contours that -c would find.
+                    contours, rement = ent.findcontours(le, lim)
+                    before = ent.lifts(contours + rement, pv.ang)
+                    contours, rement = ent.findtrails(le, lim, pv.ang)
+                elif pv.contours:
                     msg.say('Gathering connected entities into contours')
                     contours, rement = ent.findcontours(le, lim)
+                if pv.trails or pv.contours:
                     for c in contours:
                         c.layer = layer
                     ncon = 'Found {} contours, {} remaining single entities'
                     msg.say(ncon.format(len(contours), len(rement)))
                     le = contours + rement
+                if pv.trails:
+                    rs = 'Knife lifts: {} with contours, {} with trails'
+                    msg.say(rs.format(before, ent.lifts(le, pv.ang)))
                 msg.say('Sorting entities')
                 le.sort(key=lambda e: (e.bbox.minx, e.bbox.miny))
                 parts.append(le)
+            windows = [0] * len(parts)
+            if pv.window:
+                ws = 'Splitting into windows of {:.0f} mm'
+                msg.say(ws.format(pv.window))
+                x0 = bbox.merge([e.bbox for p in parts for e in p]).minx
+                split = [(k, w) for p in parts for k, w in
+                         enumerate(ent.windows(p, pv.window, x0)) if w]
+                for _, w in split:
+                    w.sort(key=lambda e: (e.bbox.minx, e.bbox.miny))
+                windows, parts = [k for k, _ in split], [w for _, w in split]
+                msg.say('Cutting {} windows'.format(max(windows) + 1))
             msg.say('Sorting pieces')
-            parts.sort(key=lambda p: bbox.merge([e.bbox for e in p]).minx)
+            keys = [(k, bbox.merge([e.bbox for e in p]).minx)
+                    for k, p in zip(windows, parts)]
+            parts = [p for _, p in sorted(zip(keys, parts),
+                                          key=lambda kp: kp[0])]
+            windows.sort()
+            if pv.reorder or pv.seams:
+                msg.say('Reordering entities')
+                before = order.airdistance([e for p in parts for e in p])
+                pos = (0.0, 0.0)
+                anglim = pv.ang if pv.seams else None
+                for p in parts:
+                    if pv.reorder:
+                        p[:] = order.reorder(p, pos, pv.band, lim=pv.limit,
+                                             anglim=anglim)
+                    else:
+                        order.seams(p, pos, pv.limit, anglim)
+                    pos = (p[-1].x[1], p[-1].y[1])
+                after = order.airdistance([e for p in parts for e in p])
+                rs = 'Movement with the knife raised reduced from {:.0f} to' \
+                    ' {:.0f} mm'
+                msg.say(rs.format(before, after))
         length = sum(e.length for e in entities)
         msg.say('Total length of entities: {:.0f} mm'.format(length))
         msg.say('Writing output to "{}"'.format(ofn))
-        write_entities(ofn, parts, pv.ang)
+        removed = write_entities(ofn, parts, pv.ang, pv.optimize, pv.arcs,
+                                 windows if pv.window else None)
+        if pv.optimize is not None:
+            rs = 'Removed {} commands: {} duplicate, {} travel, {} collinear'
+            msg.say(rs.format(sum(removed.values()), removed['duplicate'],
+                              removed['travel'], removed['collinear']))
         msg.say('File "{}" done.'.format(f))
 
 if __name__ == '__main__':
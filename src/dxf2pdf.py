@@ -50,6 +50,14 @@ def main(argv):
     :param argv: command line arguments
     """
     parser = argparse.ArgumentParser(description=__doc__)
+    argtxt = """regular expression that selects the layers to plot (defaults
+    to all layers)"""
+    parser.add_argument('--layers', help=argtxt, dest='layers',
+                        metavar='RE', type=utils.regex)
+    argtxt2 = """read the file without using or filling the cache of
+    parsed files"""
+    parser.add_argument('--no-cache', help=argtxt2, dest='cache',
+                        action='store_false')
     group = parser.add_mutually_exclusive_group()
     group.add_argument('-L', '--license', action=LicenseAction, nargs=0,
                        help="print the license")
@@ -68,7 +76,7 @@ def main(argv):
         msg.say('Starting file "{}"'.format(f))
         try:
             ofn = utils.outname(f, extension='.pdf', addenum='_dxf')
-            entities = dxf.reader(f)
+            entities = dxf.reader(f, layers=pv.layers, cache=pv.cache)
         except ValueError as ex:
             msg.say(str(ex))
             fns = "Cannot construct output filename. Skipping file '{}'."
@@ -49,8 +49,12 @@ def main(argv):
     parser = argparse.ArgumentParser(description=__doc__)
     argtxt = """maximum distance between two points considered equal when
     searching for contours (defaults to 0.5 mm)"""
+    argtxt2 = """remove duplicate lines and arcs, and the parts of lines and
+    arcs that overlap (off by default)"""
     parser.add_argument('-l', '--limit', nargs=1, help=argtxt, dest='limit',
                         metavar='F', type=float, default=0.5)
+    parser.add_argument('-d', '--dedupe', help=argtxt2, dest='dedupe',
+                        action="store_true")
     group = parser.add_mutually_exclusive_group()
     group.add_argument('-L', '--license', action=LicenseAction, nargs=0,
                        help="print the license")
@@ -69,7 +73,11 @@ def main(argv):
         msg.say('Starting file "{}"'.format(f))
         try:
             ofn = utils.outname(f, extension='.dxf', addenum='_mod')
-            entities = dxf.reader(f)
+            # Determine the extents while the file is being read.
+            entities, bb = [], None
+            for e in dxf.iter_entities(f):
+                entities.append(e)
+                bb = e.bbox if bb is None else bbox.merge([bb, e.bbox])
         except Exception as ex:  # pylint: disable=W0703
             utils.skip(ex, f)
             continue
@@ -79,8 +87,14 @@ def main(argv):
             continue
         if num > 1:
             msg.say('Contains {} entities'.format(num))
-            bbe = [e.bbox for e in entities]
-            bb = bbox.merge(bbe)
+            if pv.dedupe:
+                msg.say('Removing duplicate and overlapping entities')
+                removed = {}
+                entities = ent.dedupe(entities, lim, removed)
+                rs = 'Removed {} duplicate and trimmed {} overlapping' \
+                    ' entities, {:.0f} mm'
+                msg.say(rs.format(removed['duplicate'], removed['overlap'],
+                                  removed['length']))
             msg.say('Gathering connected entities into contours')
             contours, rement = ent.findcontours(entities, lim)
             ncon = 'Found {} contours, {} remaining single entities'
@@ -90,7 +104,6 @@ def main(argv):
             entities.sort(key=lambda e: (e.bbox.minx, e.bbox.miny))
         else:
             msg.say('Contains: 1 entity')
-            bb = entities[0].bbox
         es = 'Original extents: {:.1f} ≤ x ≤ {:.1f} mm,' \
              ' {:.1f} ≤ y ≤ {:.1f} mm'
         msg.say(es.format(bb.minx, bb.maxx, bb.miny, bb.maxy))
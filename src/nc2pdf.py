@@ -48,34 +48,12 @@ def getcuts(rd):
     """Make a list of cuts
 
     :rd: nctools.gerbernc.Reader object
-    :returns: list of (x,y) tuples representing the cuts.
+    :returns: list of arrays of (x,y) points representing the cuts, and
+        arrays of all x and y values.
     """
-    cuts = []
-    x = []
-    y = []
-    section = None
-    cutting = False
-    pos = None
-    for c, args in rd:
-        if c.startswith('down'):
-            cutting = True
-            if not pos:
-                raise ValueError('Start of cutting without pos')
-            section = [pos]
-        elif c.startswith('up'):
-            cutting = False
-            if section:
-                cuts.append(section)
-            section = None
-        elif c.startswith('moveto'):
-            _, newpos = args
-            if cutting:
-                section.append(newpos)
-            xv, yv = newpos
-            x.append(xv)
-            y.append(yv)
-            pos = newpos
-    return cuts, x, y
+    p = rd.paths(devlim=0.1)
+    cuts = [p.cuts[a:b] for a, b in zip(p.offsets, p.offsets[1:])]
+    return cuts, p.points[:, 0], p.points[:, 1]
 
 
 def main(argv):
@@ -115,8 +93,8 @@ def main(argv):
         cuts, xvals, yvals = getcuts(rd)
         cnt = len(cuts)
         msg.say('Got {} cuts'.format(cnt))
-        minx, maxx = min(xvals), max(xvals)
-        miny, maxy = min(yvals), max(yvals)
+        minx, maxx = xvals.min(), xvals.max()
+        miny, maxy = yvals.min(), yvals.max()
         bs = '{} range from {:.1f} mm to {:.1f} mm'
         msg.say(bs.format('X', minx, maxx))
         msg.say(bs.format('Y', miny, maxy))
@@ -140,10 +118,10 @@ def main(argv):
         ctx.save()
         ctx.translate(offset/2-minx, offset/2-miny)
         for section, (r, g, b) in zip(cuts, colors):
-            x1, y1 = section.pop(0)
+            (x1, y1), *rest = section.tolist()
             ctx.move_to(x1, y1)
             ctx.set_source_rgb(r/255.0, g/255.0, b/255.0)
-            for x2, y2 in section:
+            for x2, y2 in rest:
                 ctx.line_to(x2, y2)
             ctx.stroke()
         ctx.restore()
@@ -0,0 +1,94 @@
+# ncopt - main program
+# vim:fileencoding=utf-8
+
+"""Removes redundant commands from Gerber cloth cutter NC files."""
+
+__version__ = '1.12-beta'
+
+_lic = """ncopt {}
+Copyright © 2015 R.F. Smith <rsmith@xs4all.nl>. All rights reserved.
+
+Redistribution and use in source and binary forms, with or without
+modification, are permitted provided that the following conditions
+are met:
+1. Redistributions of source code must retain the above copyright
+   notice, this list of conditions and the following disclaimer.
+2. Redistributions in binary form must reproduce the above copyright
+   notice, this list of conditions and the following disclaimer in the
+   documentation and/or other materials provided with the distribution.
+
+THIS SOFTWARE IS PROVIDED BY AUTHOR AND CONTRIBUTORS ``AS IS'' AND
+ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+ARE DISCLAIMED.  IN NO EVENT SHALL AUTHOR OR CONTRIBUTORS BE LIABLE
+FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS
+OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION)
+HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY
+OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF
+SUCH DAMAGE.""".format(__version__)
+
+import argparse
+import os.path
+import sys
+from nctools import gerbernc, utils
+
+
+class LicenseAction(argparse.Action):
+    def __call__(self, parser, namespace, values, option_string=None):
+        print(_lic)
+        sys.exit()
+
+
+def main(argv):
+    """Main program for the ncopt utility.
+
+    :param argv: command line arguments
+    """
+    parser = argparse.ArgumentParser(description=__doc__)
+    argtxt = """maximum distance in mm that cuts may be moved (defaults to
+    0.1 mm)"""
+    argtxt2 = u"""minimum rotation angle in degrees where the knife needs
+    to be lifted to prevent breaking (defaults to 60°)"""
+    parser.add_argument('-t', '--tolerance', help=argtxt, dest='tol',
+                        metavar='F', type=float, default=0.1)
+    parser.add_argument('-a', '--angle', help=argtxt2, dest='ang',
+                        metavar='F', type=float, default=60)
+    group = parser.add_mutually_exclusive_group()
+    group.add_argument('-L', '--license', action=LicenseAction, nargs=0,
+                       help="print the license")
+    group.add_argument('-V', '--version', action='version',
+                       version=__version__)
+    parser.add_argument('-v', '--verbose', dest='verbose', action="store_true")
+    parser.add_argument('files', nargs='*', help='one or more file names',
+                        metavar='file')
+    pv = parser.parse_args(argv)
+    msg = utils.Msg(pv.verbose)
+    if not pv.files:
+        parser.print_help()
+        sys.exit(0)
+    for fn in utils.xpand(pv.files):
+        msg.say('Starting file "{}"'.format(fn))
+        try:
+            ext = os.path.splitext(fn)[1]
+            ofn = utils.outname(fn, extension=ext, addenum='_opt')
+            rd = gerbernc.Reader(fn)
+        except (IOError, ValueError) as e:
+            utils.skip(e, fn)
+            continue
+        removed = {}
+        blocks = gerbernc.optimize(rd.commands, pv.tol, pv.ang, removed)
+        msg.say('Writing output to "{}"'.format(ofn))
+        with open(ofn, 'w') as out:
+            out.write('*'.join(rd.header))
+            for c in blocks:
+                out.write('*' + c)
+        rs = 'Removed {} commands: {} duplicate, {} travel, {} collinear'
+        msg.say(rs.format(sum(removed.values()), removed['duplicate'],
+                          removed['travel'], removed['collinear']))
+        msg.say('File "{}" done.'.format(fn))
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
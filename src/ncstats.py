@@ -0,0 +1,111 @@
+# ncstats - main program
+# vim:fileencoding=utf-8
+
+"""Estimates the distances cut and moved and the time needed to cut Gerber
+cloth cutter NC files."""
+
+__version__ = '1.12-beta'
+
+_lic = """ncstats {}
+Copyright © 2015 R.F. Smith <rsmith@xs4all.nl>. All rights reserved.
+
+Redistribution and use in source and binary forms, with or without
+modification, are permitted provided that the following conditions
+are met:
+1. Redistributions of source code must retain the above copyright
+   notice, this list of conditions and the following disclaimer.
+2. Redistributions in binary form must reproduce the above copyright
+   notice, this list of conditions and the following disclaimer in the
+   documentation and/or other materials provided with the distribution.
+
+THIS SOFTWARE IS PROVIDED BY AUTHOR AND CONTRIBUTORS ``AS IS'' AND
+ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+ARE DISCLAIMED.  IN NO EVENT SHALL AUTHOR OR CONTRIBUTORS BE LIABLE
+FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS
+OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION)
+HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY
+OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF
+SUCH DAMAGE.""".format(__version__)
+
+import argparse
+import csv
+import json
+import sys
+from nctools import gerbernc, utils
+
+
+class LicenseAction(argparse.Action):
+    def __call__(self, parser, namespace, values, option_string=None):
+        print(_lic)
+        sys.exit()
+
+
+def total(pieces):
+    """Add the statistics of all pieces.
+
+    :param pieces: list of gerbernc.Stats
+    :returns: gerbernc.Stats for the whole program, with the piece 'total'
+    """
+    sums = [sum(col) for col in list(zip(*pieces))[1:]]
+    return gerbernc.Stats('total', *sums)
+
+
+def main(argv):
+    """Main program for the ncstats utility.
+
+    :param argv: command line arguments
+    """
+    parser = argparse.ArgumentParser(description=__doc__)
+    argtxt = """speed setting of the cutter, 1-15; every step is 305 cm/min
+    (defaults to 2)"""
+    argtxt2 = """time in seconds to raise and lower the knife (defaults to
+    0.5 s)"""
+    argtxt3 = "output format (defaults to csv)"
+    parser.add_argument('-s', '--speed', help=argtxt, dest='speed',
+                        metavar='N', type=int, choices=range(1, 16), default=2)
+    parser.add_argument('-p', '--plunge', help=argtxt2, dest='overhead',
+                        metavar='F', type=float, default=0.5)
+    parser.add_argument('-f', '--format', help=argtxt3, dest='format',
+                        choices=['csv', 'json'], default='csv')
+    group = parser.add_mutually_exclusive_group()
+    group.add_argument('-L', '--license', action=LicenseAction, nargs=0,
+                       help="print the license")
+    group.add_argument('-V', '--version', action='version',
+                       version=__version__)
+    parser.add_argument('files', nargs='*', help='one or more file names',
+                        metavar='file')
+    pv = parser.parse_args(argv)
+    if not pv.files:
+        parser.print_help()
+        sys.exit(0)
+    results = []
+    for fn in utils.xpand(pv.files):
+        try:
+            rd = gerbernc.Reader(fn)
+            pieces = gerbernc.statistics(rd, pv.speed, pv.overhead)
+        except (IOError, ValueError) as e:
+            utils.skip(e, fn)
+            continue
+        results.append((fn, pieces, total(pieces)))
+    if pv.format == 'json':
+        out = [{'file': fn, 'speed': pv.speed,
+                'pieces': [s._asdict() for s in pieces],
+                'total': tot._asdict()} for fn, pieces, tot in results]
+        json.dump(out, sys.stdout, indent=2)
+        print()
+        return
+    wr = csv.writer(sys.stdout)
+    wr.writerow(['file', 'piece', 'cut (mm)', 'air (mm)', 'lifts',
+                 'time (s)'])
+    for fn, pieces, tot in results:
+        for s in pieces + [tot]:
+            wr.writerow([fn, s.piece, '{:.1f}'.format(s.cut),
+                         '{:.1f}'.format(s.air), s.lifts,
+                         '{:.1f}'.format(s.time)])
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
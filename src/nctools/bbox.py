@@ -53,6 +53,33 @@ class BBox(object):
         else:
             raise ValueError('pnts must contain 2-tuples or 3-tuples')
 
+    @classmethod
+    def fromextents(cls, minx, maxx, miny, maxy, minz=None, maxz=None):
+        """Create a BBox from its extents.
+
+        :param minx, maxx: extents in the x direction
+        :param miny, maxy: extents in the y direction
+        :param minz, maxz: extents in the z direction, for a 3D BBox
+        """
+        rv = cls.__new__(cls)
+        rv.minx, rv.maxx, rv.miny, rv.maxy = minx, maxx, miny, maxy
+        rv.minz, rv.maxz = minz, maxz
+        rv.dim = 2 if minz is None else 3
+        return rv
+
+    @classmethod
+    def fromarray(cls, a):
+        """Create a BBox from a numpy array of points.
+
+        :param a: array of shape (N, 2) or (N, 3)
+        """
+        if len(a) == 0:
+            raise ValueError('no points to create BBox')
+        if a.ndim != 2 or a.shape[1] not in (2, 3):
+            raise ValueError('array must have shape (N, 2) or (N, 3)')
+        lo, hi = a.min(axis=0).tolist(), a.max(axis=0).tolist()
+        return cls.fromextents(*[v for pair in zip(lo, hi) for v in pair])
+
     def __str__(self):
         s2 = '<BBox {} ≤ x ≤ {}, {} ≤ y ≤ {} >'
         s3 = '<BBox {} ≤ x ≤ {}, {} ≤ y ≤ {}, {} ≤ z ≤ {} >'
@@ -64,21 +91,40 @@ class BBox(object):
     def update(self, pnts):
         """Grow the BBox to include pnts.
 
-        :param pnts: a list of 2-tuples or 3-tuples of numbers
+        :param pnts: a 2-tuple or 3-tuple of numbers, a list of those or
+            another BBox
         """
+        if isinstance(pnts, BBox):
+            if self.dim != pnts.dim:
+                raise ValueError('dimension of BBox not conform bbox.')
+            self.minx = min(self.minx, pnts.minx)
+            self.maxx = max(self.maxx, pnts.maxx)
+            self.miny = min(self.miny, pnts.miny)
+            self.maxy = max(self.maxy, pnts.maxy)
+            if self.dim == 3:
+                self.minz = min(self.minz, pnts.minz)
+                self.maxz = max(self.maxz, pnts.maxz)
+            return
         if len(pnts) in (2, 3) and isinstance(pnts[0], (int, float)):
-            pnts = [pnts]
-        tp = pnts[:]
+            pnts = (pnts,)
         if self.dim != len(pnts[0]):
             raise ValueError('dimension of pnts[0] not conform bbox.')
-        if self.dim == 2:
-            tp += [(self.minx, self.miny),
-                   (self.maxx, self.maxy)]
-            self.__init__(tp)
-        else:  # dim == 3
-            tp += [(self.minx, self.miny, self.minz),
-                   (self.maxx, self.maxy, self.maxz)]
-            self.__init__(tp)
+        for p in pnts:
+            x, y = p[0], p[1]
+            if x < self.minx:
+                self.minx = x
+            elif x > self.maxx:
+                self.maxx = x
+            if y < self.miny:
+                self.miny = y
+            elif y > self.maxy:
+                self.maxy = y
+            if self.dim == 3:
+                z = p[2]
+                if z < self.minz:
+                    self.minz = z
+                elif z > self.maxz:
+                    self.maxz = z
 
     def inside(self, pnts):
         """Determine if all the points are inside the BBox.
@@ -103,6 +149,23 @@ class BBox(object):
             return rv[0]
         return rv
 
+    def insidemask(self, pnts):
+        """Determine which points of a numpy array are inside the BBox.
+
+        :param pnts: array of shape (N, 2) or (N, 3), depending on the
+            dimension of the BBox.
+        :returns: boolean array of shape (N,)
+        """
+        if pnts.ndim != 2 or pnts.shape[1] != self.dim:
+            raise ValueError('shape of pnts not conform bbox.')
+        x, y = pnts[:, 0], pnts[:, 1]
+        rv = (x >= self.minx) & (x <= self.maxx)
+        rv &= (y >= self.miny) & (y <= self.maxy)
+        if self.dim == 3:
+            z = pnts[:, 2]
+            rv &= (z >= self.minz) & (z <= self.maxz)
+        return rv
+
     @property
     def width(self):
         """Returns the width of the bounding box
@@ -131,5 +194,12 @@ def merge(bbs):
     :bbs: A tuple or list of bounding boxes.
     :returns: A new BBox then encompasses them all.
     """
-    pnts = [p for b in bbs for p in b.points]
-    return BBox(pnts)
+    it = iter(bbs)
+    first = next(it, None)
+    if first is None:
+        raise ValueError('no bounding boxes to merge')
+    rv = BBox.fromextents(first.minx, first.maxx, first.miny, first.maxy,
+                          first.minz, first.maxz)
+    for b in it:
+        rv.update(b)
+    return rv
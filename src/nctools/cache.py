@@ -0,0 +1,132 @@
+# vim:fileencoding=utf-8
+# Copyright © 2015 R.F. Smith <rsmith@xs4all.nl>. All rights reserved.
+# $Date: 2015-04-27 18:04:10 +0200 $
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+# 1. Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright
+#    notice, this list of conditions and the following disclaimer in the
+#    documentation and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY AUTHOR AND CONTRIBUTORS ``AS IS'' AND
+# ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED.  IN NO EVENT SHALL AUTHOR OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS
+# OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION)
+# HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY
+# OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF
+# SUCH DAMAGE.
+
+"""Persistent on-disk cache for parsed drawing data.
+
+Entries are stored as NumPy .npz files, named after a key that is derived from
+the contents of the source file. Reading an entry marks it as recently used.
+When the total size of the cache exceeds maxsize, the least recently used
+entries are removed.
+
+The location of the cache can be set with the NCTOOLS_CACHE environment
+variable. Setting it to an empty string disables the cache.
+"""
+
+import hashlib
+import os
+import os.path
+import tempfile
+import zipfile
+import numpy as np
+
+
+def _defaultdir():
+    """Determine the default location of the cache.
+
+    :returns: name of the cache directory
+    """
+    base = os.environ.get('LOCALAPPDATA') or os.environ.get('XDG_CACHE_HOME')
+    if not base:
+        base = os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(base, 'nctools')
+
+
+directory = os.environ.get('NCTOOLS_CACHE', _defaultdir())
+maxsize = 256 * 2**20  # bytes
+
+
+def key(path, version):
+    """Create a cache key from the contents of a file.
+
+    :param path: name of the file
+    :param version: version of the code that produces the cached data.
+    :returns: key as a string of hexadecimal digits
+    """
+    h = hashlib.sha256('{}\n'.format(version).encode('utf-8'))
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(2**20), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def load(key):
+    """Retrieve an entry from the cache.
+
+    :param key: key of the entry
+    :returns: a dictionary of numpy arrays, or None if there is no usable
+        entry.
+    """
+    if not directory:
+        return None
+    fn = os.path.join(directory, key + '.npz')
+    try:
+        with np.load(fn, allow_pickle=False) as data:
+            rv = {k: data[k] for k in data.files}
+        os.utime(fn)
+    except (OSError, ValueError, EOFError, KeyError, zipfile.BadZipFile):
+        return None
+    return rv
+
+
+def store(key, arrays):
+    """Put an entry in the cache. Failure to do so is not an error.
+
+    :param key: key of the entry
+    :param arrays: a dictionary of numpy arrays
+    """
+    if not directory:
+        return
+    fn = os.path.join(directory, key + '.npz')
+    try:
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(suffix='.tmp', dir=directory)
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                np.savez_compressed(f, **arrays)
+            os.replace(tmp, fn)
+        except BaseException:
+            os.remove(tmp)
+            raise
+        _evict()
+    except OSError:
+        pass
+
+
+def _evict():
+    """Remove the least recently used entries until the cache fits in
+    maxsize."""
+    entries = []
+    for name in os.listdir(directory):
+        if not name.endswith('.npz'):
+            continue
+        st = os.stat(os.path.join(directory, name))
+        entries.append((st.st_mtime, st.st_size, name))
+    entries.sort()
+    total = sum(e[1] for e in entries)
+    for _, size, name in entries[:-1]:
+        if total <= maxsize:
+            break
+        os.remove(os.path.join(directory, name))
+        total -= size
@@ -24,30 +24,103 @@
 # SUCH DAMAGE.
 
 """Module for reading and writing DXF files. Only a subset of entities is
-supported; LINE, ARC and POLYLINE."""
+supported; LINE, ARC, CIRCLE, POLYLINE and LWPOLYLINE."""
 
+import array
 import datetime
 import math
-from nctools import ent
+import re
+import numpy as np
+from nctools import ent, table
+from nctools import cache as dxfcache
 
+# Version of the parser. Change it when the entities that are produced
+# change, so that stale entries in the cache are not used.
+_version = 1
 
-def reader(name):
+
+def reader(name, types=None, layers=None, cache=True):
     """Read a DXF file.
 
+    The file is read once, as a stream of (group code, value) pairs. All
+    supported entities are built during that single pass, in the order in
+    which they appear in the file. The parsed entities are kept in a cache,
+    so reading an unchanged file again doesn't parse the text.
+
     :param name: The name of the file to read.
+    :param types: Names of the entity types to read, e.g. ('LINE', 'ARC').
+        By default all supported types are read.
+    :param layers: Selects the layers to read entities from; see
+        iter_entities. By default entities from all layers are read.
+    :param cache: Use the cache of parsed files.
     :returns: A list of entities.
     """
-    with open(name, 'r') as f:
-        data = [s.strip() for s in f.readlines()]
-    soe = data.index('ENTITIES')+1
-    eoe = data.index('ENDSEC', soe)
-    lines = data[soe:eoe]
-    entities = _get_lines(lines)
-    entities += _get_arcs(lines)
-    entities += _get_circles(lines)
-    entities += _get_polylines(lines)
-    entities.sort(key=lambda x: x.index)
-    return entities
+    return list(iter_entities(name, types, layers, cache))
+
+
+def iter_entities(name, types=None, layers=None, cache=True):
+    """Generate the entities in a DXF file while the file is being read.
+
+    The file is read in chunks. Entities that are not selected are skipped
+    before any of their values are converted.
+
+    If the file is found in the cache of parsed files, the entities are
+    generated from the cache instead. Otherwise the coordinates of all
+    entities are collected in compact arrays that are stored in the cache
+    once the whole file has been read, but only the selected entities are
+    built as objects. Without the cache, the amount of memory used does not
+    depend on the size of the file.
+
+    :param name: The name of the file to read.
+    :param types: Names of the entity types to generate, e.g. ('LINE',
+        'ARC'). By default all supported types are generated.
+    :param layers: Selects the layers to generate entities from. This can be
+        a function that takes a layer name and returns a boolean, a regular
+        expression (a string or a compiled pattern) that is searched for in
+        the layer name, or a collection of layer names. By default entities
+        from all layers are generated. An invalid regular expression raises
+        a ValueError.
+    :param cache: Use the cache of parsed files.
+    :yields: ent.Line and ent.Arc objects
+    """
+    if types is not None:
+        types = {t.upper() for t in types}
+    layers = _layerfilter(layers)
+    key = None
+    if cache and dxfcache.directory:
+        key = dxfcache.key(name, _version)
+        data = dxfcache.load(key)
+        if data is not None:
+            yield from _fromcolumns(data, types, layers)
+            return
+    with open(name, 'r', errors='replace') as f:
+        if key is None:
+            for _, e in _entities(_pairs(f), types, layers):
+                yield e
+            return
+        rec = _Columns()
+        for _, e in _entities(_pairs(f), types, layers, rec):
+            yield e
+    dxfcache.store(key, rec.arrays())
+
+
+def readtable(name, types=None, layers=None, cache=True):
+    """Read the entities in a DXF file into a table.EntityTable.
+
+    If the file is found in the cache of parsed files, the table is filled
+    straight from the cached arrays, without creating entity objects.
+    The arguments are the same as for iter_entities.
+
+    :returns: a table.EntityTable
+    """
+    if cache and dxfcache.directory:
+        data = dxfcache.load(dxfcache.key(name, _version))
+        if data is not None:
+            if types is not None:
+                types = {t.upper() for t in types}
+            return _tablefromcolumns(data, types, _layerfilter(layers))
+    return table.EntityTable.fromentities(
+        iter_entities(name, types, layers, cache))
 
 
 def writer(name, progname, entities):
@@ -77,122 +150,306 @@ def writer(name, progname, entities):
         outf.write('\n'.join(lines))
 
 
-def _get_lines(lines):
-    """Generate ent.Line objects from the line in a DXF file.
-
-    :param lines: a list of lines of text
-    :returns: a list of ent.Line objects
-    """
-    idx = [num for num, ln in enumerate(lines) if ln == 'LINE']
-    rv = []
-    for i in idx:
-        num = lines.index("8", i) + 1
-        layer = lines[num]
-        num = lines.index("10", num) + 1
-        x1 = float(lines[num])
-        num = lines.index("20", num) + 1
-        y1 = float(lines[num])
-        num = lines.index("11", num) + 1
-        x2 = float(lines[num])
-        num = lines.index("21", num) + 1
-        y2 = float(lines[num])
-        rv.append(ent.Line(x1, y1, x2, y2, i, layer))
-    return rv
-
-
-def _get_arcs(lines):
-    """Generate ent.Arc objects from the arcs in a DXF file.
-
-    :param lines: a list of lines of text
-    :returns: a list of ent.Arc objects
-    """
-    idx = [num for num, ln in enumerate(lines) if ln == 'ARC']
-    rv = []
-    for i in idx:
-        num = lines.index("8", i) + 1
-        layer = lines[num]
-        num = lines.index("10", num) + 1
-        cx = float(lines[num])
-        num = lines.index("20", num) + 1
-        cy = float(lines[num])
-        num = lines.index("40", num) + 1
-        R = float(lines[num])
-        num = lines.index("50", num) + 1
-        a1 = math.radians(float(lines[num]))
-        num = lines.index("51", num) + 1
-        a2 = math.radians(float(lines[num]))
+def _pairs(f):
+    """Split the text of a DXF file into (group code, value) pairs.
+
+    :param f: file object opened in text mode
+    :yields: (int, str) tuples
+    """
+    for code, value in zip(f, f):
+        yield int(code), value.strip()
+
+
+def _entities(pairs, types=None, layers=None, rec=None):
+    """Generate entities from the ENTITIES section of a DXF file.
+
+    The index of an entity is the number of the line that contains its name,
+    counted from the start of the ENTITIES section. All entities built from
+    a polyline share the index of the POLYLINE.
+
+    :param pairs: iterator of (group code, value) pairs
+    :param types: set of entity names to generate, or None for all
+    :param layers: function that selects layers by name, or None for all
+    :param rec: if not None, a _Columns object that receives the data of
+        all entities, also those that are not selected
+    :yields: (entity name, entity) tuples. The entity is an ent.Line or
+        ent.Arc object.
+    """
+    it = enumerate(pairs)
+    for base, (code, value) in it:
+        if code == 2 and value == 'ENTITIES':
+            break
+    else:
+        raise ValueError('no ENTITIES section found')
+    kind, index, groups, verts = None, None, {}, []
+    poly = None
+    # All entities on a layer share one string for the layer name.
+    names = {}
+    for num, (code, value) in it:
+        if code != 0:
+            if kind == 'LWPOLYLINE' and code in (10, 20, 42):
+                # The vertices of an LWPOLYLINE repeat these group codes.
+                if code == 10:
+                    verts.append([value, '0', '0'])
+                elif verts:
+                    verts[-1][1 if code == 20 else 2] = value
+            elif code == 8:
+                groups[8] = names.setdefault(value, value)
+            else:
+                groups[code] = value
+            continue
+        # A new entity starts; finish the previous one.
+        if kind in ('VERTEX', 'SEQEND'):
+            if poly and kind == 'VERTEX':
+                poly[3].append((groups.get(10, '0'), groups.get(20, '0'),
+                                groups.get(42, '0')))
+            elif poly:
+                yield from _build(*poly, rec=rec)
+                poly = None
+        elif kind in _kinds:
+            sel = ((types is None or kind in types) and
+                   (layers is None or layers(groups.get(8, '0'))))
+            if kind == 'POLYLINE' and (sel or rec is not None):
+                poly = ('POLYLINE', index, groups, [], sel)
+            elif sel or rec is not None:
+                yield from _build(kind, index, groups, verts, sel, rec)
+        if value == 'ENDSEC':
+            break
+        kind, index, groups, verts = value, 2*(num - base) - 1, {}, []
+
+
+def _layerfilter(layers):
+    """Create a function that selects layers by name.
+
+    :param layers: None, a function, a regular expression or a collection of
+        layer names.
+    :returns: None if all layers are selected, otherwise a function that
+        takes a layer name and returns True if the layer is selected.
+    """
+    if layers is None:
+        return None
+    if isinstance(layers, str):
+        try:
+            layers = re.compile(layers)
+        except re.error as ex:
+            raise ValueError('invalid layer expression: {}'.format(ex))
+    if hasattr(layers, 'search'):
+        def pred(la):
+            return layers.search(la) is not None
+    elif callable(layers):
+        pred = layers
+    else:
+        names = set(layers)
+        pred = names.__contains__
+    # A drawing has few layers, so remember the verdict for each name.
+    cache = {}
+
+    def select(la):
+        try:
+            return cache[la]
+        except KeyError:
+            rv = cache[la] = bool(pred(la))
+            return rv
+    return select
+
+
+def _build(kind, index, g, vertices, selected=True, rec=None):
+    """Create entities from the group codes of a DXF entity.
+
+    :param kind: name of the DXF entity
+    :param index: sequence number of the entity
+    :param g: dictionary of group codes to values
+    :param vertices: list of (x, y, bulge) tuples of strings, one per vertex
+        of a polyline
+    :param selected: if False, no entities are created
+    :param rec: if not None, a _Columns object that receives the data
+    :yields: (entity name, entity) tuples
+    """
+    layer = g.get(8, '0')
+    rows = list(_rows(kind, g, vertices))
+    if rec is not None:
+        rec.add(kind, index, layer, rows)
+    if not selected:
+        return
+    for arc, a, b, c, d, e in rows:
+        if arc:
+            yield kind, ent.Arc(a, b, c, d, e, index, layer, arc == 1)
+        else:
+            yield kind, ent.Line(a, b, c, d, index, layer)
+
+
+def _rows(kind, g, vertices):
+    """Convert the group codes of a DXF entity to numbers.
+
+    :param kind: name of the DXF entity
+    :param g: dictionary of group codes to values
+    :param vertices: list of (x, y, bulge) tuples of strings, one per vertex
+        of a polyline
+    :yields: (arc, a, b, c, d, e) tuples, one for every line or arc. For a
+        line arc is 0 and a-d are the coordinates of the end points. For an
+        arc it is 1 (counterclockwise) or 2 (clockwise), followed by the
+        center, the radius and the start and end angles in radians.
+    """
+    if kind == 'LINE':
+        yield (0, float(g.get(10, 0)), float(g.get(20, 0)),
+               float(g.get(11, 0)), float(g.get(21, 0)), 0.0)
+    elif kind == 'ARC':
+        a1 = math.radians(float(g.get(50, 0)))
+        a2 = math.radians(float(g.get(51, 0)))
         if a2 < a1:
             a2 += 2*math.pi
-        rv.append(ent.Arc(cx, cy, R, a1, a2, i, layer))
-    return rv
-
-
-def _get_circles(lines):
-    """Generate closed ent.Arc objects from the circles in a DXF file.
-
-    :param lines: a list of lines of text
-    :returns: a list of ent.Arc objects
-    """
-    idx = [num for num, ln in enumerate(lines) if ln == 'CIRCLE']
-    rv = []
-    for i in idx:
-        num = lines.index("8", i) + 1
-        layer = lines[num]
-        num = lines.index("10", num) + 1
-        cx = float(lines[num])
-        num = lines.index("20", num) + 1
-        cy = float(lines[num])
-        num = lines.index("40", num) + 1
-        R = float(lines[num])
-        rv.append(ent.Arc(cx, cy, R, 0, 2*math.pi, i, layer))
-    return rv
-
-
-def _get_polylines(lines):
-    """Generate ent.Line and ent.Arc objects from the polylines in a DXF file.
-
-    :param lines: a list of lines of text
-    :returns: a list of ent.Line and ent.Arc objects
-    """
-    idx = [num for num, ln in enumerate(lines) if ln == 'POLYLINE']
-    rv = []
-    for i in idx:
-        num = lines.index("8", i) + 1
-        layer = lines[num]
-        try:
-            num = lines.index("70", num) + 1
-            closed = int(lines[num]) & 1
-        except ValueError:
-            closed = False
-        end = lines.index('SEQEND', i)
-        vi = [num for num, ln in enumerate(lines) if ln == 'VERTEX']
-        vi = zip(vi, vi[1:]+[end])
-        pnts = []
-        angles = []
-        for j, k in vi:
-            num = lines.index("10", j) + 1
-            x = float(lines[num])
-            num = lines.index("20", num) + 1
-            y = float(lines[num])
-            pnts.append((x, y))
-            try:
-                num = lines.index("42", num) + 1
-                if num < k:
-                    angles.append(math.atan(float(lines[num]))*4)
-                else:
-                    angles.append(0)
-            except ValueError:
-                angles.append(0)
-        if closed:
-            pnts.append(pnts[0])
-        ends = zip(pnts, pnts[1:], angles)
-        for sp, ep, a in ends:
-            if a == 0:
-                rv.append(ent.Line(sp[0], sp[1], ep[0], ep[1], i, layer))
-            else:
-                (xc, yc), R, a0, a1 = ent.arcdata(sp, ep, a)
-                rv.append(ent.Arc(xc, yc, R, a0, a1, i, layer))
-    return rv
+        yield (1, float(g.get(10, 0)), float(g.get(20, 0)),
+               float(g.get(40, 0)), a1, a2)
+    elif kind == 'CIRCLE':
+        yield (1, float(g.get(10, 0)), float(g.get(20, 0)),
+               float(g.get(40, 0)), 0, 2*math.pi)
+    else:
+        yield from _polyline(g, vertices)
+
+
+def _polyline(g, vertices):
+    """Calculate the lines and arcs of a POLYLINE or LWPOLYLINE.
+
+    The arcs for all curved sections of the polyline are calculated in one
+    go.
+
+    :param g: dictionary of group codes to values of the polyline
+    :param vertices: list of (x, y, bulge) tuples of strings, one per vertex
+    :yields: (arc, a, b, c, d, e) tuples, see _rows
+    """
+    if not vertices:
+        return
+    v = np.array(vertices, dtype=float)
+    if int(g.get(70, 0)) & 1:  # closed
+        v = np.vstack((v, v[:1]))
+    sp, ep = v[:-1, :2], v[1:, :2]
+    angs = np.arctan(v[:-1, 2])*4
+    curved = (angs != 0) & np.any(sp != ep, axis=1)
+    arcs = {}
+    if curved.any():
+        xc, yc, R, a0, a1 = ent.arcsdata(sp[curved], ep[curved], angs[curved])
+        ccw = np.where(angs[curved] > 0, 1, 2)
+        arcs = dict(zip(np.flatnonzero(curved).tolist(),
+                        zip(ccw.tolist(), xc.tolist(), yc.tolist(),
+                            R.tolist(), a0.tolist(), a1.tolist())))
+    for n, ((x1, y1), (x2, y2)) in enumerate(zip(sp.tolist(), ep.tolist())):
+        if n in arcs:
+            yield arcs[n]
+        else:
+            yield (0, x1, y1, x2, y2, 0.0)
+
+
+_kinds = ('LINE', 'ARC', 'CIRCLE', 'POLYLINE', 'LWPOLYLINE')
+
+
+class _Columns(object):
+    """Collects the data of parsed entities in compact arrays, for storage in
+    the cache."""
+
+    def __init__(self):
+        self.kind = array.array('B')
+        self.index = array.array('q')
+        self.layer = array.array('l')
+        self.arc = array.array('B')
+        self.values = array.array('d')
+        self.layers = {}
+
+    def add(self, kind, index, layer, rows):
+        """Add the lines and arcs of a DXF entity.
+
+        :param kind: name of the DXF entity
+        :param index: sequence number of the entity
+        :param layer: name of the layer
+        :param rows: list of (arc, a, b, c, d, e) tuples, see _rows
+        """
+        code = _kinds.index(kind)
+        la = self.layers.setdefault(layer, len(self.layers))
+        for arc, *values in rows:
+            self.kind.append(code)
+            self.index.append(index)
+            self.layer.append(la)
+            self.arc.append(arc)
+            self.values.extend(values)
+
+    def arrays(self):
+        """Return the collected data.
+
+        :returns: a dictionary of numpy arrays
+        """
+        return {'kind': np.frombuffer(self.kind, dtype=np.uint8),
+                'index': np.frombuffer(self.index, dtype=np.int64),
+                'layer': np.array(self.layer, dtype=np.int32),
+                'arc': np.frombuffer(self.arc, dtype=np.uint8),
+                'values': np.frombuffer(self.values).reshape(-1, 5),
+                'layers': np.array(sorted(self.layers,
+                                          key=self.layers.get), dtype=str)}
+
+
+def _fromcolumns(data, types, layers):
+    """Generate entities from data stored in the cache.
+
+    :param data: dictionary of numpy arrays, see _Columns.arrays
+    :param types: set of entity names to generate, or None for all
+    :param layers: function that selects layers by name, or None for all
+    :yields: ent.Line and ent.Arc objects
+    """
+    names = data['layers'].tolist()
+    sel = _selection(data, types, layers)
+    rows = zip(data['index'][sel].tolist(), data['layer'][sel].tolist(),
+               data['arc'][sel].tolist(), data['values'][sel].tolist())
+    for index, la, arc, (a, b, c, d, e) in rows:
+        if arc:
+            yield ent.Arc(a, b, c, d, e, index, names[la], arc == 1)
+        else:
+            yield ent.Line(a, b, c, d, index, names[la])
+
+
+def _selection(data, types, layers):
+    """Select rows of data stored in the cache.
+
+    :param data: dictionary of numpy arrays, see _Columns.arrays
+    :param types: set of entity names to select, or None for all
+    :param layers: function that selects layers by name, or None for all
+    :returns: boolean array
+    """
+    sel = np.ones(len(data['kind']), dtype=bool)
+    if types is not None:
+        codes = [n for n, k in enumerate(_kinds) if k in types]
+        sel &= np.isin(data['kind'], codes)
+    names = data['layers'].tolist()
+    if layers is not None and names:
+        sel &= np.array([layers(la) for la in names])[data['layer']]
+    return sel
+
+
+def _tablefromcolumns(data, types, layers):
+    """Create a table from data stored in the cache.
+
+    :param data: dictionary of numpy arrays, see _Columns.arrays
+    :param types: set of entity names to select, or None for all
+    :param layers: function that selects layers by name, or None for all
+    :returns: a table.EntityTable
+    """
+    sel = _selection(data, types, layers)
+    arc, v = data['arc'][sel], data['values'][sel]
+    t = table.EntityTable(len(arc))
+    t.index[:] = data['index'][sel]
+    t.layer[:] = data['layer'][sel]
+    t.layers = data['layers'].tolist()
+    t.x[:], t.y[:] = v[:, 0:3:2], v[:, 1:4:2]
+    arcs = np.flatnonzero(arc)
+    cx, cy, R, a1, a2 = v[arcs].T
+    ccw = arc[arcs] == 1
+    da = a2 - a1
+    da[ccw & (a2 <= a1)] += 2*math.pi
+    da[~ccw & (a1 <= a2)] -= 2*math.pi
+    t.kind[arcs] = table.ARC
+    t.cx[arcs], t.cy[arcs], t.R[arcs] = cx, cy, R
+    t.a[arcs, 0], t.a[arcs, 1] = a1, a2
+    t.sa[arcs], t.da[arcs] = a1, da
+    t.x[arcs, 0], t.x[arcs, 1] = cx + R*np.cos(a1), cx + R*np.cos(a2)
+    t.y[arcs, 0], t.y[arcs, 1] = cy + R*np.sin(a1), cy + R*np.sin(a2)
+    return t
 
 
 def _dxfline(e):
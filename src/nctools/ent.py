@@ -25,7 +25,12 @@
 
 """Drawing entities."""
 
+import bisect
+import collections
+import functools
+import itertools
 import math
+import numpy as np
 from nctools import bbox
 
 
@@ -34,6 +39,8 @@ class Line(object):
     The class attribute delta contains the maximum distance in x and y
     direction between eindpoints that are considered coincident.
     """
+    __slots__ = ['x', 'y', 'index', 'layer', '_bb']
+    name = 'line'
 
     def __init__(self, x1, y1, x2, y2, index=None, layer='0'):
         """Creates a line from (x1, y1) to (x2, y2).
@@ -48,8 +55,9 @@ class Line(object):
         self.y = (float(y1), float(y2))
         # index is a arbitrary sequence number °
         self.index = index
-        self.name = 'line'
         self.layer = layer
+        # Cached bounding box.
+        self._bb = None
 
     def __repr__(self):
         s = "<{} from ({},{}) to ({},{}), layer {}>"
@@ -64,25 +72,28 @@ class Line(object):
         """
         self.x = tuple(j + dx for j in self.x)
         self.y = tuple(k + dy for k in self.y)
+        self._bb = None
 
     def flip(self):
-        """Reverse the direction of a line.
+        """Reverse the direction of a line. This does not change the
+        bounding box.
         """
         self.x = tuple(reversed(self.x))
         self.y = tuple(reversed(self.y))
 
     def hsplit(self, x):
-        b = self.bbox
-        if x < b.minx or x > b.maxx:
-            return [self]  # no split
-        else:
-            frac = (x - self.x[0])/(self.x[1] - self.x[0])
-            y = self.y[0] + frac*(self.y[1] - self.y[0])
-            a = Line(self.x[0], self.y[0], x, y, self.index, self.layer)
-            b = Line(x, y, self.x[1], self.y[1], self.index, self.layer)
-            if self.x[0] < self.x[1]:
-                return [a], [b]
-            return [b], [a]
+        """Split the entity at a vertical line. The parts of a contour on
+        the same side are kept together as contours.
+
+        :x: x coordinate of the vertical line
+        :returns: a list of the parts left of the line and a list of the
+            parts right of it, both in the direction of the entity.
+        """
+        left, right = [], []
+        for k, e in _runs(_hsplit(self, [x]), lambda e: _center(e) > x,
+                          self.layer):
+            (right if k else left).append(e)
+        return left, right
 
     @property
     def points(self):
@@ -96,7 +107,9 @@ class Line(object):
         :returns: bounding box of the entity in the form of a 4-tuple (xmin,
         xmax, ymin, ymax)
         """
-        return bbox.BBox(list(zip(self.x, self.y)))
+        if self._bb is None:
+            self._bb = bbox.BBox(list(zip(self.x, self.y)))
+        return self._bb
 
     @property
     def length(self):
@@ -110,6 +123,8 @@ class Arc(Line):
     """A class for an arc entity, centering in (cx, cy) with radius R from
     angle a1 to a2.
     """
+    __slots__ = ['ccw', 'cx', 'cy', 'R', 'a', 'sa', 'da']
+    name = 'arc'
 
     def __init__(self, cx, cy, R, a1, a2, index=None, layer='0', ccw=True):
         """Creates a Arc centering in (cx, cy) with radius R and running from
@@ -135,7 +150,7 @@ class Arc(Line):
             else:
                 self.da = 2 * math.pi - a1 + a2
         else:  # CW
-            if a1 < a2:
+            if a1 > a2:
                 self.da = a2 - a1
             else:
                 self.da = a2 - a1 - 2 * math.pi
@@ -144,7 +159,6 @@ class Arc(Line):
         x2 = cx+R*math.cos(a2)
         y2 = cy+R*math.sin(a2)
         Line.__init__(self, x1, y1, x2, y2, index, layer)
-        self.name = 'arc'
 
     def move(self, dx, dy):
         Line.move(self, dx, dy)
@@ -160,34 +174,6 @@ class Arc(Line):
         self.sa = self.sa + self.da
         self.da = -self.da
 
-    def hsplit(self, x):
-        xfrac = (x - self.cx)/self.R
-        if xfrac > 1 or xfrac < -1:
-            # no split
-            return [self]
-        start = self.sa
-        p0 = math.acos(xfrac)
-        p1 = _clamp(math.pi*2-p0 - start)
-        p0 = _clamp(p0 - start)
-        if self.da > 0:
-            ip = [j for j in (p0,  p1) if 0 <= j <= self.da]
-        else:
-            ip = [j for j in (p0, p1) if self.da <= j <= 0]
-        ip.insert(0, 0.0)
-        ip.append(self.da)
-        ip = [_clamp(i + start) for i in ip]
-        rv = []
-        for sa, ea in zip(ip, ip[1:]):
-            rv.append(Arc(self.cx, self.cy, self.R, sa, ea, self.index,
-                          self.layer))
-        left, right = [], []
-        for e in rv:
-            if e.bbox.minx < x:
-                left.append(e)
-            else:
-                right.append(e)
-        return left, right
-
     def segments(self, devlim=1):
         """Create a list of points that approximates the arc.
 
@@ -195,20 +181,10 @@ class Arc(Line):
                  the arc.
         :returns: A list of points
         """
-        sa, da = self.sa, self.da
-        devlim = float(devlim)
-        if devlim > self.R:
-            cnt = 1
-        else:
-            step = 2*math.acos(1-devlim/float(self.R))
-            if da < 0:
-                step = -step
-            cnt = int(math.fabs(da/step)) + 1
-        step = da/float(cnt)
-        angs = [sa+i*step for i in range(int(cnt)+1)]
-        pnts = [(self.cx+self.R*math.cos(a),
-                 self.cy+self.R*math.sin(a)) for a in angs]
-        return pnts
+        u = _unitarc(self.R, self.da, float(devlim))
+        cx, cy, R = self.cx, self.cy, self.R
+        cs, sn = math.cos(self.sa), math.sin(self.sa)
+        return [(cx + R*(cs*c - sn*s), cy + R*(sn*c + cs*s)) for c, s in u]
 
     @property
     def bbox(self):
@@ -217,30 +193,33 @@ class Arc(Line):
         :returns: bounding box of the entity in the form of a 4-tuple (xmin,
         xmax, ymin, ymax)
 
-        We're using degrees here because it is convenient for the calculation.
+        Besides the end points, the box contains the points where the arc
+        crosses the horizontal and vertical lines through its center.
         """
-        sa = math.degrees(self.sa)
-        da = int(math.degrees(self.da))
-        if da > 0:
-            angles = [sa + t for t in range(0, da+1, 1)]
-        else:
-            angles = [sa + t for t in range(0, da-1, -1)]
-        cx, cy, R = self.cx, self.cy, self.R
-        sin, cos, rad = math.sin, math.cos, math.radians
-        points = [(cx+R*cos(rad(k)), cy+R*sin(rad(k))) for k in angles]
-        return bbox.BBox(points)
+        if self._bb is None:
+            if self.da < 0:
+                start, sweep = self.sa + self.da, -self.da
+            else:
+                start, sweep = self.sa, self.da
+            cx, cy, R = self.cx, self.cy, self.R
+            points = list(zip(self.x, self.y))
+            crossings = ((0, cx+R, cy), (1, cx, cy+R), (2, cx-R, cy),
+                         (3, cx, cy-R))
+            for k, x, y in crossings:
+                if (k*math.pi/2 - start) % (2*math.pi) <= sweep:
+                    points.append((x, y))
+            self._bb = bbox.BBox(points)
+        return self._bb
 
     @property
     def length(self):
-        if self.ccw:
-            angle = self.a[1]-self.a[0]
-        else:
-            angle = self.a[0]-self.a[1]
-        return self.R*angle
+        return self.R*math.fabs(self.da)
 
 
 class Contour(Line):
     """A contour is a list of connected entities."""
+    __slots__ = ['entities']
+    name = 'contour'
 
     def __init__(self, entities, index=None, layer=None):
         """Create a Contour from a list of entities.
@@ -256,7 +235,6 @@ class Contour(Line):
         if index is None:
             index = entities[0].index
         Line.__init__(self, x0, y0, x1, y1, index, layer)
-        self.name = 'contour'
 
     def move(self, dx, dy):
         Line.move(self, dx, dy)
@@ -268,9 +246,22 @@ class Contour(Line):
         """
         pass
 
+    def rotate(self, n):
+        """Let a closed contour start at another entity. The last point of
+        the contour should be the same as the first.
+
+        :n: index of the entity that should become the first
+        """
+        self.entities = self.entities[n:] + self.entities[:n]
+        first, last = self.entities[0], self.entities[-1]
+        self.x = (first.x[0], last.x[1])
+        self.y = (first.y[0], last.y[1])
+
     @property
     def bbox(self):
-        return bbox.merge([e.bbox for e in self.entities])
+        if self._bb is None:
+            self._bb = bbox.merge([e.bbox for e in self.entities])
+        return self._bb
 
     @property
     def length(self):
@@ -291,13 +282,10 @@ def arcdata(sp, ep, angs):
         raise ValueError('not a curved section')
     xm, ym = (xs + xe)/2.0, (ys + ye)/2.0
     xp, yp = xm - xs, ym - ys
-    lp = math.sqrt(xp**2 + yp**2)
-    lq = lp/math.tan(angs/2.0)
-    f = lq/lp
-    if angs > 0:
-        xc, yc = xm - f * yp, ym + f * xp
-    else:
-        xc, yc = xm + f * yp, ym - f * xp
+    # The center lies on the left of the chord for CCW sections and on the
+    # right for CW sections. The sign of tan(angs/2) takes care of that.
+    f = 1.0/math.tan(angs/2.0)
+    xc, yc = xm - f * yp, ym + f * xp
     R = math.sqrt((xc-xs)**2 + (yc-ys)**2)
     twopi = 2*math.pi
     a0 = math.atan2(ys - yc, xs - xc)
@@ -315,6 +303,80 @@ def arcdata(sp, ep, angs):
     return (xc, yc), R, a0, a1
 
 
+def arcsdata(sp, ep, angs):
+    """Calculate arc properties for many curved polyline sections at once.
+    This is the vectorized equivalent of arcdata.
+
+    :sp: startpoints, array of shape (N, 2)
+    :ep: endpoints, array of shape (N, 2)
+    :angs: enclosed angles, array of shape (N,). positive = CCW, negative = CW
+    :returns: arrays of center x, center y, radius, start angle, end angle
+    """
+    xs, ys = sp[:, 0], sp[:, 1]
+    xe, ye = ep[:, 0], ep[:, 1]
+    xm, ym = (xs + xe)/2.0, (ys + ye)/2.0
+    xp, yp = xm - xs, ym - ys
+    f = 1.0/np.tan(angs/2.0)
+    xc, yc = xm - f * yp, ym + f * xp
+    R = np.hypot(xc-xs, yc-ys)
+    twopi = 2*math.pi
+    a0 = np.arctan2(ys - yc, xs - xc)
+    a1 = np.arctan2(ye - yc, xe - xc)
+    ccw = angs > 0
+    a0 += np.where(np.where(ccw, a0 < 0, a0 <= 0), twopi, 0.0)
+    a1 += np.where(np.where(ccw, a1 <= 0, a1 < 0), twopi, 0.0)
+    return xc, yc, R, a0, a1
+
+
+def flatten(arcs, devlim=1):
+    """Approximate many arcs by line segments at once, like Arc.segments.
+
+    Arcs with the same radius and sweep only differ in their position and
+    starting angle. For every such group the points on the unit circle are
+    calculated once, and then rotated and scaled for all arcs in the group.
+
+    :arcs: sequence of ent.Arc
+    :devlim: Maximum distance that the line segments are to deviate from
+             the arcs.
+    :returns: A list of arrays of points with shape (N, 2), one per arc.
+    """
+    devlim = float(devlim)
+    groups = {}
+    for n, a in enumerate(arcs):
+        groups.setdefault((a.R, a.da), []).append(n)
+    rv = [None] * len(arcs)
+    for (R, da), members in groups.items():
+        u = np.array(_unitarc(R, da, devlim))
+        c = np.array([(arcs[n].cx, arcs[n].cy, arcs[n].sa) for n in members])
+        cs, sn = np.cos(c[:, 2:]), np.sin(c[:, 2:])
+        pnts = np.empty((len(members), len(u), 2))
+        pnts[:, :, 0] = c[:, 0:1] + R*(cs*u[:, 0] - sn*u[:, 1])
+        pnts[:, :, 1] = c[:, 1:2] + R*(sn*u[:, 0] + cs*u[:, 1])
+        for n, p in zip(members, pnts):
+            rv[n] = p
+    return rv
+
+
+@functools.lru_cache(maxsize=1024)
+def _unitarc(R, da, devlim):
+    """Calculate the points of an arc on the unit circle that starts at
+    angle 0, with the number of segments needed for an arc with radius R.
+
+    :R: radius
+    :da: sweep in radians, negative for a clockwise arc
+    :devlim: Maximum distance that the line segments are to deviate from
+             an arc with radius R.
+    :returns: A tuple of points.
+    """
+    if devlim > R:
+        cnt = 1
+    else:
+        step = 2*math.acos(1-devlim/R)
+        cnt = int(math.fabs(da/step)) + 1
+    step = da/cnt
+    return tuple((math.cos(i*step), math.sin(i*step)) for i in range(cnt+1))
+
+
 def _clamp(a):
     """Clamp an angle to the range [0,2π]
 
@@ -357,50 +419,701 @@ def _chkdist(p, e, lim):
     return _dist2(p, e) <= lim
 
 
-def _contour(se, ent, lim):
-    """Find a contour in a list of entities.
+class _Grid(object):
+    """A spatial hash of the end points of entities. The size of the cells
+    is the distance at which points are considered equal, so all points
+    near a given point are in the 3x3 block of cells around it.
+    """
+
+    def __init__(self, entities, lim):
+        """Create the grid.
+
+        :entities: list of entities
+        :lim: maximum square of the distance between two points considered
+            equal
+        """
+        self.entities = entities
+        self.lim = lim
+        self.size = math.sqrt(lim) if lim > 0 else 1.0
+        self.used = [False] * len(entities)
+        self.cells = {}
+        for n, e in enumerate(entities):
+            for p in e.points:
+                self.cells.setdefault(self._cell(p), []).append(n)
+
+    def _cell(self, p):
+        return (math.floor(p[0]/self.size), math.floor(p[1]/self.size))
+
+    def take(self, n):
+        """Mark entity number n as used.
+
+        :n: index of the entity
+        :returns: the entity
+        """
+        self.used[n] = True
+        return self.entities[n]
+
+    def find(self, p):
+        """Find the first unused entity that has an end point near p.
+
+        :p: a point (2-tuple)
+        :returns: the index of the entity or None.
+        """
+        i, j = self._cell(p)
+        rv = None
+        for key in ((i+a, j+b) for a in (-1, 0, 1) for b in (-1, 0, 1)):
+            cell = self.cells.get(key)
+            if not cell:
+                continue
+            if any(self.used[n] for n in cell):
+                cell[:] = [n for n in cell if not self.used[n]]
+            for n in cell:
+                if ((rv is None or n < rv) and
+                        _chkdist(p, self.entities[n].points, self.lim)):
+                    rv = n
+        return rv
+
+
+def findcontours(ent, lim=0.25):
+    """Find contours in a list of entities.
+
+    Starting from each entity in turn, connected entities are added to the
+    end and then to the start of the contour, flipping them where necessary.
+    Connected entities are looked up in a spatial hash of their end points.
 
-    :se: starting entity
     :ent: list of entities
     :lim: maximum square of the distance between two points considered equal
+    :returns: a list of contours and a list of the remaining entities.
     """
-    ent.remove(se)
-    cl = [se]
-    while True:
+    grid = _Grid(ent, lim)
+    contours, rement = [], []
+    for n, se in enumerate(ent):
+        if grid.used[n]:
+            continue
+        cl = collections.deque([grid.take(n)])
         # Look for connections at the end point
-        _, ep = cl[-1].points
-        ce = [e for e in ent if _chkdist(ep, e.points, lim)]
-        if ce:
-            newend = ce[0]
+        while True:
+            _, ep = cl[-1].points
+            m = grid.find(ep)
+            if m is None:
+                break
+            newend = grid.take(m)
             if _chkdist(ep, newend.points[1], lim):
                 newend.flip()
-            ent.remove(newend)
             cl.append(newend)
-        else:
-            # Look for connections at the start point
+        # Look for connections at the start point
+        while True:
             sp, _ = cl[0].points
-            cs = [e for e in ent if _chkdist(sp, e.points, lim)]
-            if cs:
-                newstart = cs[0]
-                if _chkdist(sp, newstart.points[0], lim):
-                    newstart.flip()
-                ent.remove(newstart)
-                cl.insert(0, newstart)
-            else:
+            m = grid.find(sp)
+            if m is None:
                 break
-    # If no additional entities are found, it's not a contour.
-    if len(cl) == 1:
-        ent.append(se)
-        return None
-    return Contour(cl)
+            newstart = grid.take(m)
+            if _chkdist(sp, newstart.points[0], lim):
+                newstart.flip()
+            cl.appendleft(newstart)
+        # If no additional entities are found, it's not a contour.
+        if len(cl) == 1:
+            rement.append(se)
+        else:
+            contours.append(Contour(list(cl)))
+    return contours, rement
 
 
-def findcontours(ent, lim=0.25):
-    """Find contours in a list of entities.
+def findtrails(ent, lim=0.25, anglim=60):
+    """Assemble a list of entities into the smallest number of contours.
+
+    The end points of the entities are merged into nodes, so the entities
+    form a graph. A connected part of this graph with k nodes where an odd
+    number of entities meet cannot be cut with less than k/2 contours, and
+    never needs more (or one closed contour if k is 0). At every node the
+    ends of the entities are paired so that the change of direction is
+    smallest, which leaves one end unpaired at every odd node. Following the
+    pairs gives k/2 open contours and possibly some closed ones, which are
+    then merged with the contours they touch.
 
     :ent: list of entities
     :lim: maximum square of the distance between two points considered equal
+    :anglim: angle in degrees above which the knife needs to be lifted
+    :returns: a list of contours and a list of the remaining entities.
+    """
+    nodes, edges = _nodes(ent, lim)
+    # The ends of entity n are numbered 2n (start) and 2n+1 (end).
+    tangents = [_tangents(e) for e in ent]
+    out = [a for t in tangents for a in (t[0], t[1] + 180)]
+    ends = [[] for _ in nodes]
+    for n, (a, b) in enumerate(edges):
+        ends[a].append(2*n)
+        ends[b].append(2*n + 1)
+
+    def sharp(p, q):
+        return int(_turn(out[p] + 180, out[q]) > anglim)
+
+    mate = [None] * len(out)
+    for at in ends:
+        pairs = sorted((_turn(out[p] + 180, out[q]), p, q)
+                       for i, p in enumerate(at) for q in at[i+1:])
+        for _, p, q in pairs:
+            if mate[p] is None and mate[q] is None:
+                mate[p], mate[q] = q, p
+    # Number the trails and find the closed ones.
+    trail, closed, members = [None] * len(ent), [], []
+    for start in _starts(mate):
+        cl = _follow(start, mate)
+        for n, _ in cl:
+            trail[n] = len(closed)
+        closed.append(mate[start] is not None)
+        members.append([k for n, _ in cl for k in (2*n, 2*n + 1)])
+    # Merge closed trails into others, at the node where that adds the
+    # fewest sharp corners.
+    root = list(range(len(closed)))
+
+    def find(t):
+        while root[t] != t:
+            root[t] = root[root[t]]
+            t = root[t]
+        return t
+
+    todo = [t for t, c in enumerate(closed) if c]
+    while todo:
+        t = find(todo.pop())
+        if not closed[t]:
+            continue
+        best = None
+        for p in members[t]:
+            if p > mate[p]:
+                continue
+            q = mate[p]
+            for r in ends[edges[p//2][p % 2]]:
+                u = find(trail[r//2])
+                if u == t or (mate[r] is not None and r > mate[r]):
+                    continue
+                s = mate[r]
+                if s is None:
+                    opts = [(sharp(r, p) - sharp(p, q), (r, p), (q, None)),
+                            (sharp(r, q) - sharp(p, q), (r, q), (p, None))]
+                else:
+                    old = sharp(p, q) + sharp(r, s)
+                    opts = [(sharp(r, p) + sharp(q, s) - old, (r, p), (q, s)),
+                            (sharp(r, q) + sharp(p, s) - old, (r, q), (p, s))]
+                for cost, x, y in opts:
+                    if best is None or cost < best[0]:
+                        best = (cost, x, y, u)
+        if best is None:
+            continue
+        _, (r, p), (q, s), u = best
+        mate[r], mate[p], mate[q] = p, r, s
+        if s is not None:
+            mate[s] = q
+        root[t] = u
+        members[u].extend(members[t])
+        if closed[u]:
+            todo.append(u)
+    contours, rement = [], []
+    for start in _starts(mate):
+        cl = _follow(start, mate)
+        if len(cl) == 1:
+            rement.append(ent[cl[0][0]])
+            continue
+        if mate[start] is not None:
+            # Start a closed contour at its sharpest corner.
+            k = max(range(len(cl)), key=lambda k: _turn(
+                out[2*cl[k-1][0] + cl[k-1][1]] + 180,
+                out[2*cl[k][0] + 1 - cl[k][1]]))
+            cl = cl[k:] + cl[:k]
+        for n, fwd in cl:
+            if not fwd:
+                ent[n].flip()
+        contours.append(Contour([ent[n] for n, _ in cl]))
+    return contours, rement
+
+
+def lifts(ent, anglim=60):
+    """Count how many times the knife is lifted when the entities are cut
+    one after another; once at the end of every entity, and at every corner
+    inside a contour that is sharper than anglim.
+
+    :ent: list of entities
+    :anglim: angle in degrees above which the knife needs to be lifted
+    :returns: the number of lifts
+    """
+    rv = len(ent)
+    for e in ent:
+        if not isinstance(e, Contour):
+            continue
+        for a, b in zip(e.entities, e.entities[1:]):
+            if _turn(_tangents(a)[1], _tangents(b)[0]) > anglim:
+                rv += 1
+    return rv
+
+
+def dedupe(ent, lim=0.25, removed=None):
+    """Remove duplicate and overlapping lines and arcs.
+
+    Lines and arcs that connect the same points are found by merging the
+    end points into nodes. The other lines are sorted by their direction and
+    position, so that lines on the same straight line are next to each other.
+    The parts of these lines that overlap with an earlier line are removed.
+    Arcs with the same center and radius are treated the same way. Entities
+    on different layers are never compared, and contours are left alone.
+
+    :ent: list of entities
+    :lim: maximum square of the distance between two points considered equal
+    :removed: optional dictionary that receives the number of duplicates
+        ('duplicate'), the number of entities that were shortened or removed
+        because they overlap ('overlap') and the removed length ('length')
+    :returns: a new list of entities
+    """
+    if removed is None:
+        removed = {}
+    removed.update(duplicate=0, overlap=0, length=0.0)
+    d = math.sqrt(lim)
+    _, edges = _nodes(ent, lim)
+    seen, rv = {}, [[e] for e in ent]
+    for n, e in enumerate(ent):
+        if isinstance(e, Contour):
+            continue
+        key = (e.layer, e.name) + tuple(sorted(edges[n]))
+        if any(not isinstance(e, Arc) or
+               _dist2(_midpoint(e), _midpoint(ent[m])) <= lim
+               for m in seen.get(key, ())):
+            rv[n] = []
+            removed['duplicate'] += 1
+            removed['length'] += e.length
+        else:
+            seen.setdefault(key, []).append(n)
+    rest = [n for n, e in enumerate(ent) if len(rv[n]) and
+            not isinstance(e, Contour) and e.length > d]
+    lines = [n for n in rest if not isinstance(ent[n], Arc)]
+    arcs = [n for n in rest if isinstance(ent[n], Arc)]
+    for group in _collinear(ent, lines, d):
+        _trimlines([ent[n] for n in group], [rv[n] for n in group], d)
+    for group in _cocircular(ent, arcs, d):
+        _trimarcs([ent[n] for n in group], [rv[n] for n in group], d)
+    for n in rest:
+        if rv[n] != [ent[n]]:
+            removed['overlap'] += 1
+            removed['length'] += ent[n].length - sum(e.length for e in rv[n])
+    return [e for r in rv for e in r]
+
+
+def windows(ent, length, x0=None):
+    """Split entities at vertical lines that are length apart, for a cutter
+    that cuts a long drawing in parts, moving the material in between.
+
+    The entities are taken from left to right. Since the boundaries of the
+    windows are evenly spaced, every entity is only split at the boundaries
+    within its bounding box. Contours are split into contours per window.
+
+    :ent: list of entities
+    :length: length of a window in the x direction
+    :x0: left side of the first window, which should not be right of any
+        entity; the left side of the entities if not given
+    :returns: a list of lists of entities, one for every window
+    """
+    if not ent:
+        return []
+    if x0 is None:
+        x0 = min(e.bbox.minx for e in ent)
+    rv = []
+
+    def window(e):
+        return max(0, int((_center(e) - x0)//length))
+
+    for e in sorted(ent, key=lambda e: e.bbox.minx):
+        b = e.bbox
+        n = int((b.minx - x0)//length) + 1
+        xs = []
+        while x0 + n*length < b.maxx:
+            xs.append(x0 + n*length)
+            n += 1
+        parts = list(_runs(_hsplit(e, xs), window, e.layer)) if xs else \
+            [(window(e), e)]
+        # A closed entity may start and end in the same window.
+        if (len(parts) > 2 and parts[0][0] == parts[-1][0] and
+                _dist2(*e.points) < 1e-6):
+            k, last = parts.pop()
+            ents = [c for p in (last, parts[0][1])
+                    for c in (p.entities if isinstance(p, Contour) else [p])]
+            parts[0] = (k, Contour(ents, layer=e.layer))
+        for k, p in parts:
+            while len(rv) <= k:
+                rv.append([])
+            rv[k].append(p)
+    return rv
+
+
+def _nodes(ent, lim):
+    """Merge the end points of the entities into nodes.
+
+    :ent: list of entities
+    :lim: maximum square of the distance between two points considered equal
+    :returns: a list of nodes, and a list of the numbers of the nodes at the
+        start and end of every entity
+    """
+    size = math.sqrt(lim) if lim > 0 else 1.0
+    cells, nodes, edges = {}, [], []
+    for e in ent:
+        ends = []
+        for p in e.points:
+            i, j = math.floor(p[0]/size), math.floor(p[1]/size)
+            near = (n for a in (-1, 0, 1) for b in (-1, 0, 1)
+                    for n in cells.get((i+a, j+b), ())
+                    if _dist2(p, nodes[n]) <= lim)
+            n = min(near, default=None)
+            if n is None:
+                n = len(nodes)
+                nodes.append(p)
+                cells.setdefault((i, j), []).append(n)
+            ends.append(n)
+        edges.append(tuple(ends))
+    return nodes, edges
+
+
+def _starts(mate):
+    """Find an end to start following every trail; the unpaired ends first,
+    then one end of every closed trail.
+
+    :mate: list of the ends paired with every end, or None
+    :returns: a generator of the ends
+    """
+    done = [False] * (len(mate)//2)
+    for first in (True, False):
+        for p in range(len(mate)):
+            if done[p//2] or (first and mate[p] is not None):
+                continue
+            for n, _ in _follow(p, mate):
+                done[n] = True
+            yield p
+
+
+def _follow(p, mate):
+    """Follow a trail from an end of an entity.
+
+    :p: end number; 2n for the start of entity n, 2n+1 for its end
+    :mate: list of the ends paired with every end, or None
+    :returns: a list of (entity number, True if the entity is traversed
+        from its start to its end)
+    """
+    rv, first = [], p
+    while True:
+        rv.append((p//2, p % 2 == 0))
+        q = mate[p ^ 1]
+        if q is None or q == first:
+            return rv
+        p = q
+
+
+def _tangents(e):
+    """Calculate the direction of an entity at its start and end point.
+
+    :e: entity
+    :returns: a 2-tuple of directions in degrees
+    """
+    if isinstance(e, Contour):
+        return _tangents(e.entities[0])[0], _tangents(e.entities[-1])[1]
+    if isinstance(e, Arc):
+        q = math.copysign(math.pi/2, e.da)
+        return (math.degrees(e.sa + q), math.degrees(e.sa + e.da + q))
+    a = math.degrees(math.atan2(e.y[1] - e.y[0], e.x[1] - e.x[0]))
+    return a, a
+
+
+def _turn(a, b):
+    """Calculate the change of direction between two headings.
+
+    :a: first heading in degrees
+    :b: second heading in degrees
+    :returns: the change of direction in degrees, between 0 and 180
+    """
+    return math.fabs((b - a + 180) % 360 - 180)
+
+
+def _midpoint(e):
+    """Calculate the point halfway along a line or arc.
+
+    :e: ent.Line or ent.Arc
+    :returns: a 2-tuple
+    """
+    if isinstance(e, Arc):
+        a = e.sa + e.da/2
+        return (e.cx + e.R*math.cos(a), e.cy + e.R*math.sin(a))
+    return ((e.x[0] + e.x[1])/2, (e.y[0] + e.y[1])/2)
+
+
+def _clusters(keys, gap):
+    """Split sorted keys into runs where successive keys differ by at most
+    gap.
+
+    :keys: sorted list of (key, item)
+    :gap: maximum difference
+    :returns: a list of lists of items
+    """
+    rv, last = [], None
+    for k, item in keys:
+        if last is None or k - last > gap:
+            rv.append([])
+        rv[-1].append(item)
+        last = k
+    return rv
+
+
+def _collinear(ent, numbers, d):
+    """Find groups of lines that lie on the same straight line.
+
+    :ent: list of entities
+    :numbers: numbers of the lines to group
+    :d: maximum distance of the end points from that straight line
+    :returns: a list of lists of numbers in ascending order
+    """
+    atol = 1e-3  # maximum difference in direction, in radians
+    layers = {}
+    for n in numbers:
+        e = ent[n]
+        a = math.atan2(e.y[1] - e.y[0], e.x[1] - e.x[0]) % math.pi
+        if a > math.pi - atol:
+            a -= math.pi
+        layers.setdefault(e.layer, []).append((a, n))
+    rv = []
+    for keys in layers.values():
+        for same in _clusters(sorted(keys), atol):
+            a = math.atan2(ent[same[0]].y[1] - ent[same[0]].y[0],
+                           ent[same[0]].x[1] - ent[same[0]].x[0])
+            s, c = math.sin(a), math.cos(a)
+            offsets = sorted((c*y - s*x, n) for n, (x, y) in
+                             ((n, _midpoint(ent[n])) for n in same))
+            for near in _clusters(offsets, d):
+                rv.extend(_groups(sorted(near), lambda m, n: all(
+                    _linedist(ent[m], p) <= d for p in ent[n].points)))
+    return rv
+
+
+def _cocircular(ent, numbers, d):
+    """Find groups of arcs that lie on the same circle.
+
+    :ent: list of entities
+    :numbers: numbers of the arcs to group
+    :d: maximum difference in radius and position of the center
+    :returns: a list of lists of numbers in ascending order
+    """
+    layers = {}
+    for n in numbers:
+        layers.setdefault(ent[n].layer, []).append((ent[n].R, n))
+    rv = []
+    for keys in layers.values():
+        for near in _clusters(sorted(keys), d):
+            rv.extend(_groups(sorted(near), lambda m, n: (
+                math.fabs(ent[m].R - ent[n].R) <= d and
+                _dist2((ent[m].cx, ent[m].cy),
+                       (ent[n].cx, ent[n].cy)) <= d*d)))
+    return rv
+
+
+def _groups(numbers, match):
+    """Put every number in the group of the first number it matches.
+
+    :numbers: list of numbers
+    :match: function that tests if a number matches the first number of a
+        group
+    :returns: a list of groups with more than one number
+    """
+    groups = []
+    for n in numbers:
+        for g in groups:
+            if match(g[0], n):
+                g.append(n)
+                break
+        else:
+            groups.append([n])
+    return [g for g in groups if len(g) > 1]
+
+
+def _linedist(e, p):
+    """Calculate the distance from a point to the straight line through a
+    line entity.
+
+    :e: ent.Line
+    :p: point (2-tuple)
+    :returns: the distance
+    """
+    dx, dy = e.x[1] - e.x[0], e.y[1] - e.y[0]
+    cross = dx*(p[1] - e.y[0]) - dy*(p[0] - e.x[0])
+    return math.fabs(cross)/math.hypot(dx, dy)
+
+
+def _subtract(iv, covered, minlen):
+    """Remove the covered parts from an interval.
+
+    :iv: interval (a, b) with a ≤ b
+    :covered: sorted list of intervals that do not overlap
+    :minlen: shorter remaining parts are left out
+    :returns: a list of the remaining parts
+    """
+    a, b = iv
+    rv, cur = [], a
+    k = bisect.bisect_left(covered, (a,))
+    if k and covered[k-1][1] > a:
+        k -= 1
+    while k < len(covered):
+        c0, c1 = covered[k]
+        k += 1
+        if c0 >= b:
+            break
+        if c0 > cur:
+            rv.append((cur, c0))
+        cur = c1
+        if cur >= b:
+            break
+    if cur < b:
+        rv.append((cur, b))
+    return [(u, v) for u, v in rv if v - u >= minlen]
+
+
+def _cover(covered, iv):
+    """Add an interval to a sorted list of intervals that do not overlap.
+    The intervals that it overlaps or touches are merged with it.
+
+    :covered: sorted list of intervals, changed in place
+    :iv: interval (a, b) with a ≤ b
+    """
+    a, b = iv
+    i = bisect.bisect_left(covered, (a,))
+    if i and covered[i-1][1] >= a:
+        i -= 1
+    j = i
+    while j < len(covered) and covered[j][0] <= b:
+        j += 1
+    if j > i:
+        a, b = min(a, covered[i][0]), max(b, covered[j-1][1])
+    covered[i:j] = [(a, b)]
+
+
+def _trimlines(lines, out, d):
+    """Remove the parts of lines on the same straight line that overlap
+    with an earlier line.
+
+    :lines: list of ent.Line
+    :out: list of lists that receive the remaining parts of every line
+    :d: parts that are shorter are removed
+    """
+    x0, y0 = lines[0].x[0], lines[0].y[0]
+    dx, dy = lines[0].x[1] - x0, lines[0].y[1] - y0
+    L = math.hypot(dx, dy)
+    ux, uy = dx/L, dy/L
+    covered = []
+    for e, r in zip(lines, out):
+        t0, t1 = [(x - x0)*ux + (y - y0)*uy for x, y in e.points]
+        iv = (min(t0, t1), max(t0, t1))
+        parts = _subtract(iv, covered, d)
+        # Lines that only touch are left alone.
+        if len(parts) == 1 and parts[0][1] - parts[0][0] > iv[1] - iv[0] - d:
+            _cover(covered, iv)
+            continue
+        # Only the parts that are kept cover later lines.
+        for p in parts:
+            _cover(covered, p)
+        if t0 > t1:
+            parts = [(v, u) for u, v in reversed(parts)]
+        (xs, ys), (xe, ye) = e.points
+        f = [((u - t0)/(t1 - t0), (v - t0)/(t1 - t0)) for u, v in parts]
+        r[:] = [Line(xs + a*(xe - xs), ys + a*(ye - ys), xs + b*(xe - xs),
+                     ys + b*(ye - ys), e.index, e.layer) for a, b in f]
+
+
+def _trimarcs(arcs, out, d):
+    """Remove the parts of arcs on the same circle that overlap with an
+    earlier arc.
+
+    :arcs: list of ent.Arc
+    :out: list of lists that receive the remaining parts of every arc
+    :d: parts that are shorter are removed
+    """
+    twopi = 2*math.pi
+    covered = []
+    for e, r in zip(arcs, out):
+        # The counterclockwise interval covered by the arc, in [0, 4π).
+        s = (e.sa if e.da > 0 else e.sa + e.da) % twopi
+        ivs = [(s, min(s + math.fabs(e.da), twopi))]
+        if s + math.fabs(e.da) > twopi:
+            ivs.append((0.0, s + math.fabs(e.da) - twopi))
+        parts = sorted(p for iv in ivs for p in _subtract(iv, covered, d/e.R))
+        kept = parts[:]
+        # Join the parts on both sides of angle 0.
+        if (len(parts) > 1 and parts[0][0] == 0.0 and
+                parts[-1][1] == twopi):
+            parts[-1] = (parts[-1][0], parts.pop(0)[1] + twopi)
+        # Arcs that only touch are left alone.
+        if (len(parts) == 1 and
+                parts[0][1] - parts[0][0] > math.fabs(e.da) - d/e.R):
+            kept = ivs
+        # Only the parts that are kept cover later arcs.
+        for iv in kept:
+            _cover(covered, iv)
+        if kept is ivs:
+            continue
+        parts.sort(key=lambda p: (p[0] - s) % twopi, reverse=e.da < 0)
+        r[:] = [Arc(e.cx, e.cy, e.R, _clamp(u), _clamp(v), e.index, e.layer)
+                if e.ccw else
+                Arc(e.cx, e.cy, e.R, _clamp(v), _clamp(u), e.index, e.layer,
+                    False) for u, v in parts]
+
+
+def _center(e):
+    """Find the x coordinate of the middle of the bounding box of an
+    entity.
+
+    :e: entity
+    :returns: the x coordinate
+    """
+    b = e.bbox
+    return (b.minx + b.maxx)/2
+
+
+def _hsplit(e, xs):
+    """Split an entity at vertical lines.
+
+    :e: entity
+    :xs: x coordinates of the vertical lines
+    :returns: a list of lines and arcs in the direction of the entity
+    """
+    if isinstance(e, Contour):
+        return [p for c in e.entities for p in _hsplit(c, xs)]
+    if isinstance(e, Arc):
+        t, twopi = [], 2*math.pi
+        for x in xs:
+            xfrac = (x - e.cx)/e.R
+            if math.fabs(xfrac) >= 1:
+                continue
+            for c in (math.acos(xfrac), -math.acos(xfrac)):
+                t.append((c - e.sa) % twopi if e.da > 0 else
+                         (e.sa - c) % twopi)
+        t = [0.0] + sorted(a for a in t if 0 < a < math.fabs(e.da))
+        t.append(math.fabs(e.da))
+        if len(t) == 2:
+            return [e]
+        sign = 1 if e.da > 0 else -1
+        return [Arc(e.cx, e.cy, e.R, _clamp(e.sa + sign*a),
+                    _clamp(e.sa + sign*b), e.index, e.layer, e.ccw)
+                for a, b in zip(t, t[1:])]
+    (xs_, ys), (xe, ye) = e.points
+    t = sorted((x - xs_)/(xe - xs_) for x in xs
+               if min(xs_, xe) < x < max(xs_, xe))
+    if not t:
+        return [e]
+    pnts = [(xs_, ys)]
+    pnts += [(xs_ + a*(xe - xs_), ys + a*(ye - ys)) for a in t]
+    pnts.append((xe, ye))
+    return [Line(a[0], a[1], b[0], b[1], e.index, e.layer)
+            for a, b in zip(pnts, pnts[1:])]
+
+
+def _runs(parts, key, layer):
+    """Join runs of parts with the same key into contours.
+
+    :parts: list of lines and arcs in the order that they are cut
+    :key: function that gives the key of a part
+    :layer: layer of the contours
+    :yields: (key, entity) tuples
     """
-    contours = [_contour(e, ent, lim) for e in ent]
-    contours = [c for c in contours if c is not None]
-    return contours, ent
+    for k, run in itertools.groupby(parts, key):
+        run = list(run)
+        yield k, (run[0] if len(run) == 1 else Contour(run, layer=layer))
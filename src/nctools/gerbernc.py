@@ -27,79 +27,156 @@
 The language and file format for PCB machines is different!
 """
 
+import array
+import collections
+import io
+import itertools
 import math
 import os.path as op
+import shutil
+import tempfile
+import numpy as np
 from nctools import bbox
 
 
+# Kinds of commands, see Reader.records.
+(END, STOP, OPTSTOP, DOWN, UP, PIECE, MOVE, ARC_CW, ARC_CCW, UNKNOWN,
+ CONVEYOR) = range(11)
+
+# Movements of the cutting head, see Reader.paths.
+Paths = collections.namedtuple('Paths', ['points', 'cuts', 'offsets'])
+
+# Work done by the cutter for a piece, see statistics.
+Stats = collections.namedtuple('Stats', ['piece', 'cut', 'air', 'lifts',
+                                         'time'])
+
+# Speed of the cutter in mm/s per step of the speed setting (305 cm/min).
+speedstep = 3050/60
+
+
 class Reader(object):
     """Reads a subset of Gerber NC files. It defaults to coordinates in
     centi-inches format.
     """
 
-    cmds = {'M0': '# end of file', 'M00': '# program stop',
-            'M01': '# optional stop', 'M14': 'down()', 'M15': 'up()'}
+    kinds = {'M0': END, 'M00': STOP, 'M01': OPTSTOP, 'M14': DOWN, 'M15': UP,
+             'M69': CONVEYOR}
+    texts = {END: '# end of file', STOP: '# program stop',
+             OPTSTOP: '# optional stop', DOWN: 'down()', UP: 'up()',
+             CONVEYOR: 'conveyor()'}
 
-    def _newpiece(self, c):
-        """Parse the N instruction.
+    # Number of characters read from the file at a time.
+    chunksize = 2**16
 
-        :c: text to parse
-        :returns: text, (number of piece)
-        """
-        num = int(c[1:])
-        return 'newpiece() # {}'.format(c[1:]), (num)
-
-    def _moveto(self, c):
-        """Parse a movement instruction.
+    def __init__(self, path):
+        """Read the header of an NC file. The commands are read from the
+        file while iterating.
 
-        :c: text to parse
-        :pnt: current (x,y) point
-        :returns: text, (startpoint, endpoint)
+        :param path: the file to read
         """
-        oldpos = self.pos
-        x, y = [int(t) for t in c[1:].split('Y')]
-        p, q = cin2mm([x, y])
-        self.pos = (p, q)
-        s = 'moveto({:.1f}, {:.1f})'
-        return s.format(p, q), (oldpos, self.pos)
-
-    def _arc(self, c):
-        """Parse an arc movement instruction.
-
-        :c: text to parse
-        :pnt: current (x,y) point
-        :returns: text, (startpoint, endpoint, center of arc)
-        """
-        oldpos = self.pos
-        if c[2] == '2':
-            direction = 'arc_cw'
-        elif c[2] == '3':
-            direction = 'arc_ccw'
-        ct = c[4:].replace('Y', ' ').replace('I', ' ').replace('J', ' ')
-        x, y, i, j = [int(n) for n in ct.split()]
-        p, q, r, s = cin2mm([x, y, i, j])
-        self.pos = (p, q)
-        fs = '{}({:.1f}, {:.1f}, {:.1f}, {:.1f})'
-        return fs.format(direction, p, q, r, s), (oldpos, self.pos, (i, j))
-
-    def __init__(self, path):
         self.path = path
         with open(path, 'r') as f:
-            c = f.read().split('*')
-            if not c[0].startswith('H') and 'M20' not in c[0:3]:
-                raise ValueError('{} is not a valid NC file.'.format(path))
-        if c[1].startswith('ZX'):
+            blocks = _blocks(f, Reader.chunksize)
+            c = [b for _, b in zip(range(4), blocks)]
+        if len(c) < 3 or (not c[0].startswith('H') and 'M20' not in c[0:3]):
+            raise ValueError('{} is not a valid NC file.'.format(path))
+        if c[1].startswith('ZX') and len(c) == 4:
             ident = c[3].split('/')
-            del c[0:4]
+            self.skip = 4
         elif c[1] == 'M20':
             ident = c[2].split('/')
-            del c[0:3]
+            self.skip = 3
+        else:
+            raise ValueError('{} is not a valid NC file.'.format(path))
+        self.header = c[:self.skip]
         self.name = ident[0]
         self.length = float(ident[1][2:]) * 25.4  # mm
         self.width = float(ident[2][2:]) * 25.4  # mm
-        self.commands = c
         self.pos = None
 
+    @property
+    def commands(self):
+        """Generate the commands after the header.
+
+        :yields: the text of the commands
+        """
+        with open(self.path, 'r') as f:
+            blocks = _blocks(f, Reader.chunksize)
+            for _ in zip(range(self.skip), blocks):
+                pass
+            yield from blocks
+
+    def records(self):
+        """Decode the NC commands without producing text.
+
+        :yields: (kind, args) tuples. The args are the number of the piece
+            for PIECE, the end point (x, y) in mm for MOVE, the end point and
+            center (x, y, i, j) in mm for ARC_CW and ARC_CCW, the text of the
+            command for UNKNOWN and None for the other kinds.
+        """
+        kinds = Reader.kinds
+        for c in self.commands:
+            k = kinds.get(c)
+            if k is not None:
+                yield k, None
+                if k == END:
+                    return
+            elif c[:1] == 'X':
+                x, y = c[1:].split('Y')
+                yield MOVE, (int(x) * 0.254, int(y) * 0.254)
+            elif c[:1] == 'N':
+                yield PIECE, int(c[1:])
+            elif c[:3] in ('G02', 'G03'):
+                ct = c[4:]
+                for ch in 'YIJ':
+                    ct = ct.replace(ch, ' ')
+                args = tuple(int(n) * 0.254 for n in ct.split())
+                yield (ARC_CW if c[2] == '2' else ARC_CCW), args
+            else:
+                yield UNKNOWN, c
+
+    def paths(self, devlim=None):
+        """Decode the movements of the cutting head into arrays.
+
+        :param devlim: if not None, arcs are replaced by points where the
+            straight lines between them deviate at most this distance in mm
+            from the arc. Otherwise arcs are represented by their end points.
+        :returns: a Paths tuple. Its points are all the positions that the
+            head moves to, in mm, as an array of shape (N, 2). The cuts are
+            the points of all cut sections one after another, as an array of
+            shape (M, 2). A cut section starts where the knife is lowered and
+            ends where it is raised. The points of section n are
+            cuts[offsets[n]:offsets[n+1]].
+        """
+        points, cuts = array.array('d'), array.array('d')
+        offsets = array.array('q', [0])
+        pos, cutting = None, False
+        for kind, args in self.records():
+            if kind in (MOVE, ARC_CW, ARC_CCW):
+                if kind != MOVE and devlim is not None and pos is not None:
+                    pnts = _arcpoints(pos, args[:2], args[2:],
+                                      kind == ARC_CCW, devlim)
+                else:
+                    pnts = [args[:2]]
+                pos = args[:2]
+                for p in pnts:
+                    points.extend(p)
+                    if cutting:
+                        cuts.extend(p)
+            elif kind == DOWN and not cutting:
+                if pos is None:
+                    raise ValueError('start of cutting without position')
+                cutting = True
+                cuts.extend(pos)
+            elif kind == UP and cutting:
+                cutting = False
+                offsets.append(len(cuts) // 2)
+        # Discard a section that was not finished.
+        del cuts[2 * offsets[-1]:]
+        return Paths(np.frombuffer(points).reshape(-1, 2),
+                     np.frombuffer(cuts).reshape(-1, 2),
+                     np.frombuffer(offsets, dtype=np.int64))
+
     def __iter__(self):
         """Iterate over the NC commands.
 
@@ -109,31 +186,61 @@ class Reader(object):
         yield '# Name of part: {}'.format(self.name), (self.name)
         fs = '# Length: {:.1f} mm, width {:.1f} mm'
         yield fs.format(self.length, self.width), (self.length, self.width)
-        for c in self.commands:
-            if c in Reader.cmds.keys():
-                yield Reader.cmds[c], ()
-                if c == 'M0':
-                    raise StopIteration
-            elif c[0] == 'N':
-                yield self._newpiece(c)
-            elif c[0] == 'X':
-                yield self._moveto(c)
-            elif c[:3] in ['G02', 'G03']:
-                yield self._arc(c)
+        self.pos = None
+        for kind, args in self.records():
+            if kind == MOVE:
+                oldpos, self.pos = self.pos, args
+                yield 'moveto({:.1f}, {:.1f})'.format(*args), (oldpos, args)
+            elif kind in (ARC_CW, ARC_CCW):
+                oldpos, self.pos = self.pos, args[:2]
+                direction = 'arc_cw' if kind == ARC_CW else 'arc_ccw'
+                fs = '{}({:.1f}, {:.1f}, {:.1f}, {:.1f})'
+                yield (fs.format(direction, *args),
+                       (oldpos, self.pos, args[2:]))
+            elif kind == PIECE:
+                yield 'newpiece() # {}'.format(args), (args)
+            elif kind == UNKNOWN:
+                yield 'unknown command: "{}"'.format(args), ()
             else:
-                yield 'unknown command: "{}"'.format(c), ()
+                yield Reader.texts[kind], ()
+
+
+def _blocks(f, size):
+    """Split the contents of a file into blocks separated by '*', reading
+    the file in chunks.
+
+    :param f: file opened in text mode
+    :param size: number of characters to read at a time
+    :yields: the text of the blocks
+    """
+    rest = ''
+    while True:
+        chunk = f.read(size)
+        if not chunk:
+            break
+        parts = (rest + chunk).split('*')
+        rest = parts.pop()
+        yield from parts
+    yield rest
 
 
 class Writer(object):
     """Writes Gerber NC files."""
 
-    def __init__(self, path, name=None, anglim=60):
+    def __init__(self, path, name=None, anglim=60, optimize=None,
+                 arcs=None):
         """Initialize the writer.
 
         :param path: the output file
         :param name: name of the program. If not given, the basename without
         any extension will be used.
         :param anglim: limit of angle between continuou cuts.
+        :param optimize: if not None, the commands are passed through
+        gerbernc.optimize with this tolerance in mm before writing. The
+        numbers of removed commands are then found in the attribute removed.
+        :param arcs: if not None, moveto_many cuts runs of points that lie
+        on a circle within this tolerance in mm as arcs. The original
+        controller of the cutter doesn't know the arc commands.
         """
         self.path = path
         self.name = name
@@ -145,24 +252,65 @@ class Writer(object):
         self.bbox = None
         self.f = None
         self.anglim = float(anglim)
+        self.optimize = optimize
+        self.arcs = arcs
+        self.removed = {}
         self.piece = 0
-        # commands[2] is an empty placeholder. The name, length and width of
-        # the program need to be put there before writing.
-        self.commands = ['H1', 'M20', '', 'M15']
+        # The header contains the name, length and width of the program, so
+        # it can only be written at the end. Until then the commands that
+        # follow it are spooled to a temporary file. The last command is
+        # held back because it might have to be removed; prev is the command
+        # before it.
+        self.spool = io.TextIOWrapper(tempfile.TemporaryFile(),
+                                      encoding='utf-8', newline='')
+        self.prev, self.last = 'M15', None
+        self.header = ['H1', 'M20', '', 'M15']
 
     def __str__(self):
-        return '*'.join(self.commands)
+        self.spool.flush()
+        raw = self.spool.buffer
+        raw.seek(0)
+        body = raw.read().decode('utf-8')
+        raw.seek(0, io.SEEK_END)
+        if self.last is not None:
+            body += '*' + self.last
+        return '*'.join(self.header) + body
+
+    def _add(self, cmd):
+        """Add a command to the program.
+
+        :param cmd: text of the command
+        """
+        if self.last is not None:
+            self.spool.write('*' + self.last)
+            self.prev = self.last
+        self.last = cmd
+
+    def _extend(self, cmds):
+        """Add a list of commands to the program.
+
+        :param cmds: list of the texts of the commands
+        """
+        if not cmds:
+            return
+        if self.last is not None:
+            self.spool.write('*' + self.last)
+            self.prev = self.last
+        self.spool.write(''.join('*' + c for c in cmds[:-1]))
+        if len(cmds) > 1:
+            self.prev = cmds[-2]
+        self.last = cmds[-1]
 
     def newpiece(self):
         """Start a new piece."""
         self.piece += 1
-        self.commands += ['N{}'.format(self.piece)]
+        self._add('N{}'.format(self.piece))
 
     def up(self):
         """Stop cutting (raise the knife)."""
         self.cut = False
         self.ang = None
-        self.commands += ['M15']
+        self._add('M15')
 
     def down(self):
         """Start cutting (lower the knife)."""
@@ -173,7 +321,15 @@ class Writer(object):
             self.bbox = bbox.BBox(self.pos)
         else:
             self.bbox.update(self.pos)
-        self.commands += ['M14']
+        self._add('M14')
+
+    def conveyor(self):
+        """Move the conveyor to bring the next part of the material under
+        the cutting head. The knife is raised first.
+        """
+        if self.cut:
+            self.up()
+        self._add('M69')
 
     def moveto(self, x, y):
         """Move the cutting head from the current position to the indicated
@@ -185,20 +341,150 @@ class Writer(object):
         x, y = mm2cin([x, y])
         if self.cut:  # We're cutting
             self.bbox.update((x, y))
-            dx, dy = x - self.pos[0], y - self.pos[1]
-            newang = math.degrees(math.atan2(dy, dx))
-            if newang < 0.0:
-                newang += 360.0
+            newang = _heading(x - self.pos[0], y - self.pos[1])
             if self.ang is not None:
-                angdif = math.fabs(newang-self.ang)
-                if angdif > 180:
-                    angdif = 360 - angdif
-                if angdif > self.anglim:
-                    self.commands += ['M15', 'M14']
+                if _turn(self.ang, newang) > self.anglim:
+                    self._add('M15')
+                    self._add('M14')
             self.ang = newang
-        self.commands += ['X{:.0f}Y{:.0f}'.format(x, y)]
+        self._add('X{:.0f}Y{:.0f}'.format(x, y))
+        self.pos = (x, y)
+
+    def moveto_many(self, points):
+        """Move the cutting head along a list of points. This gives the same
+        result as calling moveto for every point, but the headings, the
+        turns where the knife is lifted and the extents are calculated for
+        all points at once. If the writer was made with an arcs tolerance,
+        runs of cut points that lie on a circle are cut as arcs instead.
+
+        :param points: sequence of (x, y) coordinates in mm, or an array
+            of shape (N, 2)
+        """
+        p = np.asarray(points, dtype=float).reshape(-1, 2) * 100.0 / 25.4
+        if not len(p):
+            return
+        if self.cut and self.arcs is not None:
+            # Index n in q is index n-1 in p.
+            q = np.concatenate(([self.pos], p))
+            done = 0
+            for first, last, (cx, cy), ccw in fitarcs(q, mm2cin(self.arcs)):
+                self._lines(p[done:first])
+                x, y = q[last].tolist()
+                self._arc(x, y, cx, cy, ccw)
+                done = last
+            p = p[done:]
+        self._lines(p)
+
+    def _lines(self, p):
+        """Move the cutting head along points in straight lines.
+
+        :param p: array of shape (N, 2) of coordinates in 1/100 in
+        """
+        if not len(p):
+            return
+        moves = ['X{:.0f}Y{:.0f}'.format(x, y) for x, y in p.tolist()]
+        if not self.cut:
+            self._extend(moves)
+            self.pos = tuple(p[-1].tolist())
+            return
+        self.bbox.update(bbox.BBox.fromarray(p))
+        d = np.diff(p, axis=0, prepend=[self.pos])
+        newang = np.degrees(np.arctan2(d[:, 1], d[:, 0]))
+        newang[newang < 0.0] += 360.0
+        oldang = np.empty_like(newang)
+        oldang[1:] = newang[:-1]
+        oldang[0] = np.nan if self.ang is None else self.ang
+        angdif = np.abs(newang - oldang)
+        angdif = np.where(angdif > 180, 360 - angdif, angdif)
+        # Redo turns close to the limit exactly like moveto, since the
+        # vectorized functions can differ in the last bit.
+        near = np.flatnonzero(np.abs(angdif - self.anglim) < 1e-6).tolist()
+        lift = (angdif > self.anglim).tolist()
+        dl = d.tolist()
+        for n in near:
+            new = _heading(*dl[n])
+            old = _heading(*dl[n-1]) if n else self.ang
+            lift[n] = old is not None and _turn(old, new) > self.anglim
+        cmds = []
+        for up, move in zip(lift, moves):
+            if up:
+                cmds += ['M15', 'M14']
+            cmds.append(move)
+        self._extend(cmds)
+        self.ang = _heading(*dl[-1])
+        self.pos = tuple(p[-1].tolist())
+
+    def arcto(self, x, y, cx, cy, ccw=True):
+        """Move the cutting head from the current position to the indicated
+        position along an arc, using G02 (clockwise) and G03
+        (counterclockwise) commands. If the end point is the current
+        position, a full circle is cut. An arc that lies within the arcs
+        tolerance of the writer from a straight line is cut straight.
+
+        :param x: x coordinate of the end point in mm
+        :param y: y coordinate of the end point in mm
+        :param cx: x coordinate of the center in mm
+        :param cy: y coordinate of the center in mm
+        :param ccw: True for a counterclockwise arc
+        """
+        if not self.pos:
+            raise ValueError('arc from unknown position')
+        self._arc(*mm2cin([x, y, cx, cy]), ccw=ccw)
+
+    def _arc(self, x, y, cx, cy, ccw):
+        """Move the cutting head along an arc. The arc is split into equal
+        pieces of at most half a circle that are not too long for a single
+        command.
+
+        :param x: x coordinate of the end point in 1/100 in
+        :param y: y coordinate of the end point in 1/100 in
+        :param cx: x coordinate of the center in 1/100 in
+        :param cy: y coordinate of the center in 1/100 in
+        :param ccw: True for a counterclockwise arc
+        """
+        R, sa, da = _sweep(self.pos, (x, y), (cx, cy), ccw)
+        if (self.arcs is not None and da <= math.pi and
+                R*(1 - math.cos(da/2)) <= mm2cin(self.arcs)):
+            self._lines(np.array([(x, y)]))
+            return
+        sign = 1.0 if ccw else -1.0
+        n = max(math.ceil(da/math.pi - 1e-9), math.ceil(R*da/_maxmove))
+        pnts = [(cx + R*math.cos(sa + sign*da*k/n),
+                 cy + R*math.sin(sa + sign*da*k/n)) for k in range(1, n)]
+        pnts.append((x, y))
+        cmds = []
+        if self.cut:
+            # The arc reaches its extents at the end points and where it
+            # crosses the axes through the center.
+            q = math.pi/2
+            first = q - math.fmod(sa*sign % (2*math.pi), q)
+            for t in np.arange(first, da, q).tolist():
+                self.bbox.update((cx + R*math.cos(sa + sign*t),
+                                  cy + R*math.sin(sa + sign*t)))
+            self.bbox.update((x, y))
+            tangent = (math.degrees(sa) + 90*sign) % 360
+            if self.ang is not None and _turn(self.ang, tangent) > self.anglim:
+                cmds += ['M15', 'M14']
+            self.ang = (math.degrees(sa + sign*da) + 90*sign) % 360
+        fs = 'G0{}X{:.0f}Y{:.0f}I{:.0f}J{:.0f}'
+        cmds += [fs.format(3 if ccw else 2, px, py, cx, cy)
+                 for px, py in pnts]
+        self._extend(cmds)
         self.pos = (x, y)
 
+    def cut_path(self, points):
+        """Cut along a list of points: move to the first point, lower the
+        knife, move along the other points and raise the knife.
+
+        :param points: sequence of (x, y) coordinates in mm, or an array
+            of shape (N, 2)
+        """
+        (x, y), rest = points[0], points[1:]
+        self.moveto(x, y)
+        self.down()
+        self.moveto_many(rest)
+        self.up()
+
     def write(self):
         """Write the NC file.
         """
@@ -214,17 +500,429 @@ class Writer(object):
         """Stop context manager."""
         li = self.bbox.width/100.0
         wi = self.bbox.height/100.0
-        self.commands[2] = '{}/L={:.3f}/W={:.3f}'.format(self.name, li, wi)
-        if self.commands[-1].startswith('N'):
-            del self.commands[-1]  # Remove unnecessary newpiece()
-        if not self.commands[-1] == 'M15':
-            self.commands.append('M15')
-        self.commands.append('M0')
-        self.f.write('*'.join(self.commands).encode('utf-8'))
+        self.header[2] = '{}/L={:.3f}/W={:.3f}'.format(self.name, li, wi)
+        tail, end = [], self.prev
+        if self.last is not None and not self.last.startswith('N'):
+            tail, end = [self.last], self.last
+        # A trailing newpiece() is unnecessary, so it is left out.
+        if end != 'M15':
+            tail.append('M15')
+        tail.append('M0')
+        self.f.write('*'.join(self.header).encode('utf-8'))
+        self.spool.seek(0)
+        if self.optimize is None:
+            shutil.copyfileobj(self.spool.buffer, self.f)
+            body = tail
+        else:
+            blocks = _blocks(self.spool, Reader.chunksize)
+            next(blocks)  # The spool starts with a separator.
+            body = optimize(itertools.chain(blocks, tail), self.optimize,
+                            self.anglim, self.removed)
+        for c in body:
+            self.f.write(('*' + c).encode('utf-8'))
+        self.spool.close()
         self.f.write(b'*')
         self.f.close()
 
 
+def statistics(rd, speed=2, overhead=0.5):
+    """Replay an NC program to estimate how long the cutter needs for it.
+
+    The head is assumed to move at the set speed both with the knife down
+    and up, without accelerating or slowing down. Every time the knife is
+    raised, the overhead is added for raising and lowering it. The movement
+    to the first known position isn't counted, since the starting position
+    of the head is not in the program.
+
+    :param rd: gerbernc.Reader
+    :param speed: speed setting of the cutter, 1-15
+    :param overhead: time in seconds for raising and lowering the knife
+    :returns: a list of Stats tuples, one for every piece. The cut and air
+        fields are the distances moved with the knife down and up in mm,
+        lifts is the number of times the knife is raised and time is the
+        estimated time in seconds. Movements before the first N command
+        are counted as piece 0, if there are any.
+    """
+    # Every item is [piece, cut, air, lifts].
+    pieces = [[0, 0.0, 0.0, 0]]
+    pos, cutting = None, False
+    for kind, args in rd.records():
+        cur = pieces[-1]
+        if kind in (MOVE, ARC_CW, ARC_CCW):
+            if pos is None:
+                dist = 0.0
+            elif kind == MOVE:
+                dist = math.hypot(args[0] - pos[0], args[1] - pos[1])
+            else:
+                R, _, da = _sweep(pos, args[:2], args[2:], kind == ARC_CCW)
+                dist = R*da
+            cur[1 if cutting else 2] += dist
+            pos = args[:2]
+        elif kind == DOWN:
+            cutting = True
+        elif kind == UP and cutting:
+            cutting = False
+            cur[3] += 1
+        elif kind == PIECE:
+            pieces.append([args, 0.0, 0.0, 0])
+    if pieces[0][1:3] == [0.0, 0.0] and len(pieces) > 1:
+        del pieces[0]
+    rate = speed*speedstep
+    return [Stats(n, c, a, k, (c + a)/rate + k*overhead)
+            for n, c, a, k in pieces]
+
+
+def optimize(blocks, tol=0.1, anglim=60, stats=None):
+    """Remove redundant commands from the body of an NC program.
+
+    Three kinds of commands are removed:
+
+    * Movements to the point where the head already is.
+    * Raising the knife and lowering it again at the same point, if the cut
+      goes on in a direction that differs less than anglim from the
+      direction it came from. Around arcs the knife is always lifted.
+    * Points of a cut that lie within tol of the straight line between the
+      points around them. A merged movement is never longer than the 60 in
+      that the cutter allows in a single block.
+
+    :param blocks: iterator of the texts of the commands after the header
+    :param tol: maximum distance in mm that a cut may be moved
+    :param anglim: minimum turning angle in degrees where the knife needs to
+        be lifted
+    :param stats: optional dictionary that counts the removed commands of
+        every kind under the keys 'duplicate', 'travel' and 'collinear'
+    :yields: the texts of the remaining commands
+    """
+    if stats is None:
+        stats = {}
+    for k in ('duplicate', 'travel', 'collinear'):
+        stats.setdefault(k, 0)
+    blocks = _duplicates(blocks, stats)
+    blocks = _lifts(blocks, float(anglim), stats)
+    return _collinear(blocks, mm2cin(tol), stats)
+
+
+# Maximum length of a single movement with the knife down, in 1/100 in.
+_maxmove = 6000
+
+
+def _xy(c):
+    """Get the end point of a movement command.
+
+    :param c: text of an X or G02/G03 command
+    :returns: (x, y) in 1/100 in
+    """
+    if c[0] == 'G':
+        c = c[3:].split('I')[0]
+    x, y = c[1:].split('Y')
+    return int(x), int(y)
+
+
+def _duplicates(blocks, stats):
+    """Remove movements to the current position.
+
+    :param blocks: iterator of the texts of commands
+    :param stats: dictionary of counts of removed commands
+    :yields: the texts of the remaining commands
+    """
+    pos = None
+    for c in blocks:
+        if c[:1] == 'X':
+            p = _xy(c)
+            if p == pos:
+                stats['duplicate'] += 1
+                continue
+            pos = p
+        elif c[:3] in ('G02', 'G03'):
+            pos = _xy(c)
+        yield c
+
+
+def _lifts(blocks, anglim, stats):
+    """Remove raising and lowering the knife at the same point where the cut
+    continues in nearly the same direction.
+
+    :param blocks: iterator of the texts of commands without duplicate
+        movements
+    :param anglim: minimum turning angle in degrees where the knife needs to
+        be lifted
+    :param stats: dictionary of counts of removed commands
+    :yields: the texts of the remaining commands
+    """
+    pos, ang, cutting = None, None, False
+    held = []
+    for c in blocks:
+        if held:
+            # held is ['M15'] or ['M15', 'M14'] at the same position.
+            if len(held) == 1 and c == 'M14':
+                held.append(c)
+                continue
+            if len(held) == 2 and c[:1] == 'X' and pos is not None:
+                x, y = _xy(c)
+                new = _heading(x - pos[0], y - pos[1])
+                if ang is not None and _turn(ang, new) <= anglim:
+                    stats['travel'] += 2
+                    held = []
+                    cutting = True
+            for h in held:
+                yield h
+            if held:
+                cutting = held[-1] == 'M14'
+                ang = None
+            held = []
+        if c == 'M15' and cutting:
+            held = [c]
+            continue
+        if c[:1] == 'X' or c[:3] in ('G02', 'G03'):
+            p = _xy(c)
+            if cutting and c[0] == 'X' and pos is not None:
+                ang = _heading(p[0] - pos[0], p[1] - pos[1])
+            else:
+                ang = None
+            pos = p
+        elif c == 'M14':
+            cutting, ang = True, None
+        elif c == 'M15':
+            cutting, ang = False, None
+        yield c
+    for h in held:
+        yield h
+
+
+def _collinear(blocks, tol, stats):
+    """Merge cut movements that lie on nearly the same line.
+
+    :param blocks: iterator of the texts of commands
+    :param tol: maximum distance in 1/100 in that a cut may be moved
+    :param stats: dictionary of counts of removed commands
+    :yields: the texts of the remaining commands
+    """
+    pos, cutting = None, False
+    # The last cut movement is held back in end, and the points it replaced
+    # are in skipped.
+    anchor, end, skipped = None, None, []
+    for c in blocks:
+        if cutting and c[:1] == 'X':
+            p = _xy(c)
+            if end is None:
+                end = (p, c)
+            elif anchor and _fits(anchor, p, skipped + [end[0]], tol):
+                skipped.append(end[0])
+                end = (p, c)
+                stats['collinear'] += 1
+            else:
+                yield end[1]
+                anchor, end, skipped = end[0], (p, c), []
+            pos = p
+            continue
+        if end is not None:
+            yield end[1]
+            end, skipped = None, []
+        if c[:1] == 'X' or c[:3] in ('G02', 'G03'):
+            pos = _xy(c)
+        elif c == 'M14':
+            cutting = True
+        elif c == 'M15':
+            cutting = False
+        anchor = pos
+        yield c
+    if end is not None:
+        yield end[1]
+
+
+def _fits(a, b, pnts, tol):
+    """Check if points lie close enough to a line segment to be replaced by
+    it.
+
+    :param a: start point of the segment
+    :param b: end point of the segment
+    :param pnts: list of points
+    :param tol: maximum distance
+    :returns: True if all points are within tol of the segment and the
+        segment is not too long for a single movement
+    """
+    dx, dy = b[0] - a[0], b[1] - a[1]
+    ll = dx*dx + dy*dy
+    if ll > _maxmove**2:
+        return False
+    for x, y in pnts:
+        px, py = x - a[0], y - a[1]
+        t = 0.0 if ll == 0 else min(max((px*dx + py*dy) / ll, 0.0), 1.0)
+        ex, ey = px - t*dx, py - t*dy
+        if ex*ex + ey*ey > tol*tol:
+            return False
+    return True
+
+
+def fitarcs(points, tol=0.1):
+    """Find runs of points that lie on circular arcs, e.g. polylines that
+    approximate rounded corners.
+
+    A run consists of at least four points that turn in the same direction.
+    All points and all the straight lines between them lie within tol of
+    the arc through them. Runs that are within tol of a straight line are
+    not reported, and neither are arcs of a full circle or more.
+
+    :param points: sequence of (x, y) coordinates, or an array of shape
+        (N, 2)
+    :param tol: maximum deviation, in the same unit as the points
+    :returns: list of (first, last, (cx, cy), ccw) tuples, where first and
+        last are the indices of the first and last point of the run, (cx,
+        cy) is the center and ccw is True for counterclockwise arcs. The
+        runs don't overlap, but the last point of a run can be the first of
+        the next one.
+    """
+    p = np.asarray(points, dtype=float).reshape(-1, 2)
+    d = np.diff(p, axis=0)
+    # Cross products of consecutive segments, at points 1 ... N-2.
+    cross = d[:-1, 0]*d[1:, 1] - d[:-1, 1]*d[1:, 0]
+    runs = []
+    first = 0
+    while first < len(p) - 3:
+        # Grow the run in doubling steps, then search for the longest run
+        # between the last one that fits and the first one that doesn't.
+        good, step = None, 3
+        while (first + step < len(p) and
+               _arcfit(p, cross, first, first + step, tol)):
+            good, step = first + step, 2*step
+        if good is None or _straight(p[first:good+1], tol):
+            first += 1
+            continue
+        bad = min(first + step, len(p))
+        while bad - good > 1:
+            mid = (good + bad)//2
+            if _arcfit(p, cross, first, mid, tol):
+                good = mid
+            else:
+                bad = mid
+        center, ccw = _arcfit(p, cross, first, good, tol)
+        runs.append((first, good, center, ccw))
+        first = good
+    return runs
+
+
+def _arcfit(points, crosses, first, last, tol):
+    """Check if a run of points lies on an arc.
+
+    :param points: array of shape (N, 2) of points
+    :param crosses: cross products of consecutive segments at points[1:-1]
+    :param first: index of the first point of the run
+    :param last: index of the last point of the run
+    :param tol: maximum deviation
+    :returns: ((cx, cy), ccw) or None if the points don't fit an arc
+    """
+    p = points[first:last+1]
+    cross = crosses[first:last-1]
+    if not (np.all(cross > 0) or np.all(cross < 0)):
+        return None
+    a, b, c = p[0], p[len(p)//2], p[-1]
+    bx, by, cx, cy = b[0] - a[0], b[1] - a[1], c[0] - a[0], c[1] - a[1]
+    det = 2*(bx*cy - by*cx)
+    if det == 0:
+        return None
+    bb, cc = bx*bx + by*by, cx*cx + cy*cy
+    ox = a[0] + (cy*bb - by*cc)/det
+    oy = a[1] + (bx*cc - cx*bb)/det
+    R = math.hypot(a[0] - ox, a[1] - oy)
+    r = np.hypot(p[:, 0] - ox, p[:, 1] - oy)
+    if np.max(np.abs(r - R)) > tol:
+        return None
+    # The middle of a straight segment lies at R - sqrt(R² - (L/2)²) from
+    # the arc.
+    h = np.hypot(*(p[1:] - p[:-1]).T)/2
+    if np.any(h > R) or np.max(R - np.sqrt(R*R - h*h)) > tol:
+        return None
+    ccw = bool(cross[0] > 0)
+    ang = np.unwrap(np.arctan2(p[:, 1] - oy, p[:, 0] - ox))
+    steps = np.diff(ang) if ccw else -np.diff(ang)
+    if np.any(steps <= 0) or np.sum(steps) >= 2*math.pi:
+        return None
+    return (float(ox), float(oy)), ccw
+
+
+def _straight(p, tol):
+    """Check if points lie close to the line between the first and the last
+    point. Such points are better cut straight.
+
+    :param p: array of shape (N, 2) of points
+    :param tol: maximum deviation
+    :returns: True if the points lie within tol from the line
+    """
+    dx, dy = p[-1] - p[0]
+    chord = math.hypot(dx, dy)
+    if chord == 0:
+        return False
+    dev = np.abs((p[:, 0] - p[0, 0])*dy - (p[:, 1] - p[0, 1])*dx)
+    return bool(np.max(dev) <= tol*chord)
+
+
+def _sweep(start, end, center, ccw):
+    """Calculate the size of an arc.
+
+    :param start: start point (x, y)
+    :param end: end point (x, y)
+    :param center: center point (x, y)
+    :param ccw: True for a counterclockwise arc
+    :returns: radius, start angle and the angle the arc turns through in
+        radians, in the range (0, 2π]. A full circle is returned when the
+        end point is the start point.
+    """
+    R = math.hypot(start[0] - center[0], start[1] - center[1])
+    sa = math.atan2(start[1] - center[1], start[0] - center[0])
+    ea = math.atan2(end[1] - center[1], end[0] - center[0])
+    da = (ea - sa if ccw else sa - ea) % (2*math.pi)
+    if abs(end[0] - start[0]) + abs(end[1] - start[1]) < 1e-6:
+        da = 2*math.pi
+    return R, sa, da
+
+
+def _arcpoints(start, end, center, ccw, devlim):
+    """Approximate an arc by points.
+
+    :param start: start point (x, y)
+    :param end: end point (x, y)
+    :param center: center point (x, y)
+    :param ccw: True for a counterclockwise arc
+    :param devlim: maximum deviation of the lines between the points from
+        the arc
+    :returns: list of points after the start point, up to the end point
+    """
+    R, sa, da = _sweep(start, end, center, ccw)
+    step = 2*math.acos(1 - devlim/R) if devlim < R else math.pi
+    n = max(math.ceil(da/step), 1)
+    sign = 1.0 if ccw else -1.0
+    pnts = [(center[0] + R*math.cos(sa + sign*da*k/n),
+             center[1] + R*math.sin(sa + sign*da*k/n)) for k in range(1, n)]
+    pnts.append(tuple(end))
+    return pnts
+
+
+def _heading(dx, dy):
+    """Calculate the direction of a movement.
+
+    :param dx: movement in the x direction
+    :param dy: movement in the y direction
+    :returns: angle in degrees in the range [0, 360)
+    """
+    ang = math.degrees(math.atan2(dy, dx))
+    if ang < 0.0:
+        ang += 360.0
+    return ang
+
+
+def _turn(a, b):
+    """Calculate the angle between two directions.
+
+    :param a: first direction in degrees
+    :param b: second direction in degrees
+    :returns: angle in degrees in the range [0, 180]
+    """
+    angdif = math.fabs(b - a)
+    if angdif > 180:
+        angdif = 360 - angdif
+    return angdif
+
+
 def mm2cin(arg):
     """Convert millimeters to 1/100 in
 
@@ -0,0 +1,446 @@
+# vim:fileencoding=utf-8
+# Copyright © 2015 R.F. Smith <rsmith@xs4all.nl>. All rights reserved.
+# $Date: 2015-04-27 18:04:10 +0200 $
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+# 1. Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright
+#    notice, this list of conditions and the following disclaimer in the
+#    documentation and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY AUTHOR AND CONTRIBUTORS ``AS IS'' AND
+# ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED.  IN NO EVENT SHALL AUTHOR OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS
+# OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION)
+# HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY
+# OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF
+# SUCH DAMAGE.
+
+"""Ordering of cuts to reduce the movements with the knife raised.
+
+Every entity is a node with an entry and an exit point. Lines and arcs can be
+cut in either direction. Contours are always cut in the direction they were
+assembled in, but a closed contour is entered and left at the same point.
+
+An order is first made by going to the nearest entry point every time, using
+a spatial.RTree. That order is then improved with 2-opt moves (cutting a run
+of entities in the reverse order) and Or-opt moves (moving a run of up to
+three entities to another place) until no improvement is found or the time
+budget is spent.
+
+The material is moved by a conveyor in the x direction, so the entities can
+be divided into bands by the minimum x of their extents. The bands are cut
+one after another.
+
+A closed contour can be entered at any of its vertices, which is called the
+seam. A seam at a sharp corner saves raising and lowering the knife there.
+"""
+
+import math
+import time
+import numpy as np
+from nctools import ent, spatial
+
+
+def airdistance(entities, start=(0.0, 0.0)):
+    """Calculate the distance moved with the knife raised when cutting
+    entities in the given order.
+
+    :param entities: list of entities
+    :param start: position of the cutting head before the first entity
+    :returns: distance in mm
+    """
+    x, y = start
+    total = 0.0
+    for e in entities:
+        total += math.hypot(e.x[0] - x, e.y[0] - y)
+        x, y = e.x[1], e.y[1]
+    return total
+
+
+def reorder(entities, start=(0.0, 0.0), band=None, budget=1.0, lim=0.5,
+            anglim=None, corner=50.0):
+    """Order entities to reduce the distance moved with the knife raised.
+    Lines and arcs that are better cut the other way around are flipped.
+
+    :param entities: list of entities
+    :param start: position of the cutting head before the first entity
+    :param band: if not None, the width in mm of the bands in the x
+        direction that are cut one after another
+    :param budget: maximum time in seconds to spend on improving the order
+    :param lim: maximum distance between the ends of a closed contour
+    :param anglim: if not None, closed contours may be entered at any
+        vertex, and the seams are chosen with this angle limit; see seams
+    :param corner: see seams
+    :returns: list of the entities in the new order
+    """
+    if not entities:
+        return []
+    if band:
+        x0 = min(e.bbox.minx for e in entities)
+        groups = {}
+        for e in entities:
+            groups.setdefault(int((e.bbox.minx - x0)//band), []).append(e)
+        groups = [groups[k] for k in sorted(groups)]
+    else:
+        groups = [list(entities)]
+    deadline = time.perf_counter() + budget
+    first, left = start, len(entities)
+    rv = []
+    for g in groups:
+        # Every band gets a share of the remaining time.
+        now = time.perf_counter()
+        end = now + max(deadline - now, 0.0)*len(g)/left
+        left -= len(g)
+        S = np.array([(e.x[0], e.y[0]) for e in g], dtype=float)
+        E = np.array([(e.x[1], e.y[1]) for e in g], dtype=float)
+        fixed = np.array([isinstance(e, ent.Contour) for e in g])
+        # A closed contour has the same entry and exit point, so cutting it
+        # in a reversed run makes no difference.
+        closed = fixed & (np.hypot(*(E - S).T) <= lim)
+        E[closed] = S[closed]
+        fixed &= ~closed
+        vertices = None
+        if anglim is not None:
+            nums = np.flatnonzero(closed)
+            v = [_vertices(g[i])[0] for i in nums.tolist()]
+            if v:
+                vertices = (np.repeat(nums, [len(p) for p in v]),
+                            np.concatenate(v))
+        tour, rev = _nearest(S, E, fixed, start, vertices)
+        # Start from the given order if that is better.
+        given = np.arange(len(g)), np.zeros(len(g), dtype=bool)
+        if _cost(S, E, start, *given) < _cost(S, E, start, tour, rev):
+            tour, rev = given
+        tour, rev = _improve(S, E, fixed, start, tour, rev, end)
+        for i, r in zip(tour.tolist(), rev.tolist()):
+            if r and not closed[i]:
+                g[i].flip()
+            rv.append(g[i])
+        start = (rv[-1].x[1], rv[-1].y[1])
+    if anglim is not None:
+        seams(rv, first, lim, anglim, corner)
+    return rv
+
+
+def seams(entities, start=(0.0, 0.0), lim=0.5, anglim=60, corner=50.0):
+    """Choose where closed contours are entered, for entities that are cut
+    in the given order. Every closed contour is rotated so that it starts at
+    one of its vertices, such that the total distance moved with the knife
+    raised is the shortest. Entering at a vertex with a sharp corner counts
+    as the corner distance shorter, because otherwise the knife would have
+    to be raised and lowered there. The default is roughly the distance
+    covered at speed setting 2 in the time that takes.
+
+    The choices for consecutive contours depend on each other, so the best
+    combination is found by dynamic programming over the sequence.
+
+    :param entities: list of entities. Contours are changed in place.
+    :param start: position of the cutting head before the first entity
+    :param lim: maximum distance between the ends of a closed contour
+    :param anglim: minimum turning angle in degrees where the knife needs to
+        be lifted
+    :param corner: distance in mm that entering at a sharp corner is worth
+    """
+    if not entities:
+        return
+    exits = np.array([start], dtype=float)
+    cost = np.zeros(1)
+    back, closed = [], []
+    for e in entities:
+        if (isinstance(e, ent.Contour) and
+                math.hypot(e.x[1] - e.x[0], e.y[1] - e.y[0]) <= lim):
+            V, turn = _vertices(e)
+            entries, bonus = V, corner*(turn > anglim)
+            closed.append(True)
+        else:
+            entries, bonus = np.array([(e.x[0], e.y[0])]), np.zeros(1)
+            V = np.array([(e.x[1], e.y[1])])
+            closed.append(False)
+        cost, best = _link(exits, cost, entries)
+        cost -= bonus
+        back.append(best)
+        exits = V
+    n = int(np.argmin(cost))
+    for k in range(len(entities) - 1, -1, -1):
+        if closed[k] and n:
+            entities[k].rotate(n)
+        n = int(back[k][n])
+
+
+def _link(exits, cost, entries, size=1 << 16, group=64):
+    """Find the cheapest way to reach every entry point from the previous
+    exit points.
+
+    The entries are done in groups of neighbouring points, so that the
+    memory used doesn't grow with the product of the numbers of points. For
+    every group the exits are tried in order of a lower bound of their cost,
+    the cost plus the distance to the extents of the group. The search stops
+    when no remaining exit can be better for any entry in the group.
+
+    :param exits: array of shape (N, 2) of the previous exit points
+    :param cost: array of the costs to arrive at those exit points
+    :param entries: array of shape (M, 2) of the entry points
+    :param size: number of combinations to calculate at once
+    :param group: number of entries in a group
+    :returns: array of the lowest costs to arrive at the entry points, and
+        an array of the numbers of the exits they are reached from
+    """
+    low = np.full(len(entries), np.inf)
+    best = np.zeros(len(entries), dtype=np.intp)
+    for c in range(0, len(entries), group):
+        P = entries[c:c+group]
+        m = len(P)
+        out = np.maximum(np.maximum(P.min(axis=0) - exits,
+                                    exits - P.max(axis=0)), 0.0)
+        bound = cost + np.hypot(*out.T)
+        todo = np.argsort(bound, kind='stable')
+        lo, nr = low[c:c+group], best[c:c+group]
+        step = max(size//m, 1)
+        for k in range(0, len(todo), step):
+            rows = todo[k:k+step]
+            if bound[rows[0]] >= lo.max():
+                break
+            d = np.hypot(P[None, :, 0] - exits[rows, None, 0],
+                         P[None, :, 1] - exits[rows, None, 1])
+            d += cost[rows, None]
+            j = np.argmin(d, axis=0)
+            d = d[j, np.arange(m)]
+            better = d < lo
+            lo[better] = d[better]
+            nr[better] = rows[j[better]]
+    return low, best
+
+
+def _vertices(c):
+    """Find the vertices of a closed contour.
+
+    :param c: ent.Contour
+    :returns: array of shape (N, 2) with the start points of the entities
+        in the contour, and an array of the turning angles in degrees at
+        those points
+    """
+    V = np.array([(e.x[0], e.y[0]) for e in c.entities])
+    into = np.array([_heading(e, True) for e in c.entities])
+    out = np.array([_heading(e, False) for e in c.entities])
+    turn = np.abs(out - np.roll(into, 1)) % 360
+    return V, np.where(turn > 180, 360 - turn, turn)
+
+
+def _heading(e, end):
+    """Calculate the direction of a line or arc at one of its ends.
+
+    :param e: ent.Line or ent.Arc
+    :param end: True for the end point, False for the start point
+    :returns: direction in degrees
+    """
+    if isinstance(e, ent.Arc):
+        a = e.sa + e.da if end else e.sa
+        return math.degrees(a + math.copysign(math.pi/2, e.da))
+    return math.degrees(math.atan2(e.y[1] - e.y[0], e.x[1] - e.x[0]))
+
+
+def _nearest(S, E, fixed, start, seams=None):
+    """Make an order by going to the nearest entry point every time.
+
+    :param S: array of shape (N, 2) of the start points
+    :param E: array of shape (N, 2) of the end points
+    :param fixed: boolean array, True for entities that cannot be flipped
+    :param start: position of the cutting head
+    :param seams: optional tuple of an array of numbers of closed contours
+        and an array of shape (M, 2) of their vertices, where they can be
+        entered as well. The start and end point of a contour that is
+        entered at a vertex are set to that vertex.
+    :returns: array of the numbers of the entities in order, and a boolean
+        array that is True where an entity is cut in reverse
+    """
+    n = len(S)
+    if seams is None:
+        seams = np.zeros(0, dtype=np.intp), np.zeros((0, 2))
+    tour, rev = [], []
+    done = np.zeros(n, dtype=bool)
+    x, y = start
+    while len(tour) < n:
+        # The points are the start points of the remaining entities, the
+        # end points of those that can be flipped and the vertices.
+        remaining = np.flatnonzero(~done)
+        free = remaining[~fixed[remaining]]
+        alive = ~done[seams[0]]
+        pts = np.concatenate((S[remaining], E[free], seams[1][alive]))
+        ids = np.concatenate((remaining, free, seams[0][alive]))
+        ends = len(remaining) + len(free)
+        tree = spatial.RTree(np.column_stack((pts[:, 0], pts[:, 0],
+                                              pts[:, 1], pts[:, 1])))
+        where = {}
+        for k, i in enumerate(ids.tolist()):
+            where.setdefault(i, []).append(k)
+        skip = set()
+        # Rebuild the tree when half of the nodes are done, so that the
+        # search doesn't wade through points that are no longer needed.
+        for _ in range(max(len(remaining)//2, 1)):
+            _, k = tree.nearest(x, y, 1, skip)[0]
+            i = int(ids[k])
+            r = len(remaining) <= k < ends
+            if k >= ends:
+                S[i] = E[i] = pts[k]
+            tour.append(i)
+            rev.append(r)
+            done[i] = True
+            skip.update(where[i])
+            x, y = S[i] if r else E[i]
+    return np.array(tour, dtype=np.intp), np.array(rev, dtype=bool)
+
+
+def _cost(S, E, start, tour, rev):
+    """Calculate the distance moved with the knife raised for an order.
+
+    :param S: array of shape (N, 2) of the start points
+    :param E: array of shape (N, 2) of the end points
+    :param start: position of the cutting head
+    :param tour: array of the numbers of the entities in order
+    :param rev: boolean array, True where an entity is cut in reverse
+    :returns: distance
+    """
+    A = np.where(rev[:, None], E[tour], S[tour])
+    B = np.where(rev[:, None], S[tour], E[tour])
+    prev = np.concatenate(([start], B[:-1]))
+    return np.hypot(*(A - prev).T).sum()
+
+
+def _improve(S, E, fixed, start, tour, rev, deadline):
+    """Improve an order with 2-opt and Or-opt moves.
+
+    :param S: array of shape (N, 2) of the start points
+    :param E: array of shape (N, 2) of the end points
+    :param fixed: boolean array, True for entities that cannot be flipped
+    :param start: position of the cutting head
+    :param tour: array of the numbers of the entities in order
+    :param rev: boolean array, True where an entity is cut in reverse
+    :param deadline: value of time.perf_counter() to stop at
+    :returns: the improved tour and rev arrays
+    """
+    start = np.array(start, dtype=float)
+    # Entry and exit points in the order of the tour.
+    A = np.where(rev[:, None], E[tour], S[tour])
+    B = np.where(rev[:, None], S[tour], E[tour])
+    F = fixed[tour]
+    improved = True
+    while improved and time.perf_counter() < deadline:
+        improved = False
+        for i in range(len(tour)):
+            if time.perf_counter() > deadline:
+                break
+            j = _twoopt(A, B, F, start, i)
+            if j is not None:
+                back = np.arange(j, i - 1, -1)
+                A[i:j+1], B[i:j+1] = B[back], A[back]
+                tour[i:j+1], rev[i:j+1] = tour[back], ~rev[back]
+                F[i:j+1] = F[back]
+                improved = True
+        for length in (1, 2, 3):
+            i = 0
+            while i <= len(tour) - length:
+                if time.perf_counter() > deadline:
+                    break
+                move = _oropt(A, B, F, start, i, length)
+                if move:
+                    k, flip = move
+                    seg = slice(i, i + length)
+                    order = np.arange(len(tour))
+                    rest = np.delete(order, order[seg])
+                    part = order[seg][::-1] if flip else order[seg]
+                    order = np.concatenate((rest[:k+1], part, rest[k+1:]))
+                    A, B = A[order], B[order]
+                    tour, rev, F = tour[order], rev[order], F[order]
+                    if flip:
+                        at = slice(k + 1, k + 1 + length)
+                        A[at], B[at] = B[at].copy(), A[at].copy()
+                        rev[at] = ~rev[at]
+                    improved = True
+                i += 1
+    return tour, rev
+
+
+def _twoopt(A, B, F, start, i):
+    """Find the best reversal of a run of entities that starts at position i.
+
+    :param A: array of the entry points in order
+    :param B: array of the exit points in order
+    :param F: boolean array, True for entities that cannot be flipped
+    :param start: position of the cutting head
+    :param i: first position of the run
+    :returns: the last position of the run, or None if no reversal shortens
+        the movements
+    """
+    if F[i]:
+        return None
+    n = len(A)
+    # The run can't contain entities that cannot be flipped.
+    stop = np.flatnonzero(F[i:])
+    m = n - i if not len(stop) else stop[0]
+    X = start if i == 0 else B[i-1]
+    Bj, Anext = B[i:i+m], A[i+1:i+m+1]
+    old = np.zeros(m)
+    new = np.zeros(m)
+    k = len(Anext)
+    old[:k] = np.hypot(*(Bj[:k] - Anext).T)
+    new[:k] = np.hypot(*(A[i] - Anext).T)
+    new += np.hypot(*(Bj - X).T)
+    old += math.hypot(*(A[i] - X))
+    delta = new - old
+    j = int(np.argmin(delta))
+    if delta[j] < -1e-9:
+        return i + j
+    return None
+
+
+def _oropt(A, B, F, start, i, length):
+    """Find the best place to move a run of entities to.
+
+    :param A: array of the entry points in order
+    :param B: array of the exit points in order
+    :param F: boolean array, True for entities that cannot be flipped
+    :param start: position of the cutting head
+    :param i: first position of the run
+    :param length: number of entities in the run
+    :returns: (k, flip) where the run should be placed after position k of
+        the order without the run (-1 for the first place), and flip is True
+        if the run should be reversed. None if no move shortens the
+        movements.
+    """
+    n = len(A)
+    a, b = A[i], B[i + length - 1]
+    X = start if i == 0 else B[i-1]
+    gain = math.hypot(*(a - X))
+    if i + length < n:
+        Y = A[i + length]
+        gain += math.hypot(*(b - Y)) - math.hypot(*(X - Y))
+    keep = np.ones(n, dtype=bool)
+    keep[i:i+length] = False
+    RA, RB = A[keep], B[keep]
+    # Insert after the previous exit point P, before the next entry point N.
+    P = np.concatenate(([start], RB))
+    N = RA
+    m = len(N)
+    fwd = np.hypot(*(P - a).T)
+    fwd[:m] += np.hypot(*(N - b).T) - np.hypot(*(N - P[:m]).T)
+    delta = fwd - gain
+    k = int(np.argmin(delta))
+    best, flip = delta[k], False
+    if not F[i:i+length].any():
+        back = np.hypot(*(P - b).T)
+        back[:m] += np.hypot(*(N - a).T) - np.hypot(*(N - P[:m]).T)
+        delta = back - gain
+        kb = int(np.argmin(delta))
+        if delta[kb] < best:
+            best, k, flip = delta[kb], kb, True
+    if best < -1e-9:
+        return k - 1, flip
+    return None
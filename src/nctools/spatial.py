@@ -0,0 +1,174 @@
+# vim:fileencoding=utf-8
+# Copyright © 2015 R.F. Smith <rsmith@xs4all.nl>. All rights reserved.
+# $Date: 2015-04-27 18:04:10 +0200 $
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+# 1. Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright
+#    notice, this list of conditions and the following disclaimer in the
+#    documentation and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY AUTHOR AND CONTRIBUTORS ``AS IS'' AND
+# ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED.  IN NO EVENT SHALL AUTHOR OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS
+# OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION)
+# HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY
+# OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF
+# SUCH DAMAGE.
+
+"""Spatial index of bounding boxes.
+
+An RTree is bulk loaded with the Sort-Tile-Recursive (STR) algorithm. The
+boxes are sorted in vertical slices by the x coordinate of their centers, and
+within every slice by the y coordinate. Consecutive runs of boxes then form
+the leaves, and the same is done for the boxes of the leaves, until a single
+root is left. Every level of the tree is an array of boxes, and queries are
+answered one level at a time.
+"""
+
+import heapq
+import math
+import numpy as np
+from nctools import bbox
+
+
+class RTree(object):
+    """A static R-tree of 2D bounding boxes."""
+
+    def __init__(self, boxes, leafsize=16):
+        """Build the tree.
+
+        :param boxes: a sequence of bbox.BBox, or an array of shape (N, 4)
+            with the columns minx, maxx, miny, maxy like the extents of a
+            table.EntityTable.
+        :param leafsize: maximum number of children per node
+        """
+        if len(boxes) and isinstance(boxes[0], bbox.BBox):
+            boxes = [(b.minx, b.maxx, b.miny, b.maxy) for b in boxes]
+        boxes = np.asarray(boxes, dtype=float).reshape(-1, 4)
+        self.leafsize = int(leafsize)
+        if self.leafsize < 2:
+            raise ValueError('leafsize should be at least 2')
+        # levels[0] holds the boxes themselves. The children of node i of
+        # level n are kids[n][ptr[n][i]:ptr[n][i+1]] in level n-1.
+        self.levels, self.kids, self.ptr = [boxes], [None], [None]
+        while len(self.levels[-1]) > 1:
+            below = self.levels[-1]
+            order = _strorder(below, self.leafsize)
+            sb = below[order]
+            starts = np.arange(0, len(below), self.leafsize)
+            node = np.empty((len(starts), 4))
+            node[:, 0] = np.minimum.reduceat(sb[:, 0], starts)
+            node[:, 1] = np.maximum.reduceat(sb[:, 1], starts)
+            node[:, 2] = np.minimum.reduceat(sb[:, 2], starts)
+            node[:, 3] = np.maximum.reduceat(sb[:, 3], starts)
+            self.levels.append(node)
+            self.kids.append(order)
+            self.ptr.append(np.append(starts, len(below)))
+
+    def __len__(self):
+        return len(self.levels[0])
+
+    def _children(self, n, nodes):
+        """Find the children of nodes.
+
+        :param n: level of the nodes
+        :param nodes: array of node numbers
+        :returns: array of the numbers of the children in level n-1
+        """
+        lo = self.ptr[n][nodes]
+        cnt = self.ptr[n][nodes + 1] - lo
+        offsets = np.repeat(lo - np.cumsum(cnt) + cnt, cnt)
+        return self.kids[n][offsets + np.arange(cnt.sum())]
+
+    def window(self, minx, maxx, miny, maxy):
+        """Find the boxes that overlap a rectangle. Boxes that only touch
+        the rectangle count as overlapping.
+
+        :param minx, maxx: extents of the rectangle in the x direction
+        :param miny, maxy: extents of the rectangle in the y direction
+        :returns: array of the numbers of the boxes, in ascending order
+        """
+        top = len(self.levels) - 1
+        cand = np.arange(len(self.levels[top]))
+        for n in range(top, -1, -1):
+            b = self.levels[n][cand]
+            hit = ((b[:, 0] <= maxx) & (b[:, 1] >= minx) &
+                   (b[:, 2] <= maxy) & (b[:, 3] >= miny))
+            cand = cand[hit]
+            if n:
+                cand = self._children(n, cand)
+        return np.sort(cand)
+
+    def point(self, x, y):
+        """Find the boxes that contain a point.
+
+        :param x, y: coordinates of the point
+        :returns: array of the numbers of the boxes, in ascending order
+        """
+        return self.window(x, x, y, y)
+
+    def nearest(self, x, y, k=1, skip=None):
+        """Find the boxes nearest to a point. The distance to a box is zero
+        when the point is inside it.
+
+        :param x, y: coordinates of the point
+        :param k: number of boxes to find
+        :param skip: optional container of numbers of boxes to pass over
+        :returns: list of (distance, number of the box) tuples, nearest first
+        """
+        top = len(self.levels) - 1
+        dist = _distance(self.levels[top], x, y).tolist()
+        heap = [(d, top, i) for i, d in enumerate(dist)]
+        heapq.heapify(heap)
+        rv = []
+        # Best first search; a node is never nearer than its parent.
+        while heap and len(rv) < k:
+            d, n, i = heapq.heappop(heap)
+            if n == 0:
+                if not skip or i not in skip:
+                    rv.append((d, i))
+                continue
+            kids = self.kids[n][self.ptr[n][i]:self.ptr[n][i+1]]
+            dist = _distance(self.levels[n-1][kids], x, y).tolist()
+            for j, d in zip(kids.tolist(), dist):
+                heapq.heappush(heap, (d, n - 1, j))
+        return rv
+
+
+def _strorder(boxes, leafsize):
+    """Sort boxes in Sort-Tile-Recursive order.
+
+    :param boxes: array of shape (N, 4)
+    :param leafsize: number of boxes per group
+    :returns: array of indices into boxes
+    """
+    count = len(boxes)
+    if count <= leafsize:
+        return np.arange(count)
+    cx = boxes[:, 0] + boxes[:, 1]
+    cy = boxes[:, 2] + boxes[:, 3]
+    slices = math.ceil(math.sqrt(math.ceil(count / leafsize)))
+    byx = np.argsort(cx, kind='stable')
+    slab = np.empty(count, dtype=np.intp)
+    slab[byx] = np.arange(count) // (slices * leafsize)
+    return np.lexsort((cy, slab))
+
+
+def _distance(boxes, x, y):
+    """Calculate the distance from a point to boxes.
+
+    :param boxes: array of shape (N, 4)
+    :param x, y: coordinates of the point
+    :returns: array of distances
+    """
+    dx = np.maximum(np.maximum(boxes[:, 0] - x, x - boxes[:, 1]), 0)
+    dy = np.maximum(np.maximum(boxes[:, 2] - y, y - boxes[:, 3]), 0)
+    return np.hypot(dx, dy)
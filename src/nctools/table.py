@@ -0,0 +1,324 @@
+# vim:fileencoding=utf-8
+# Copyright © 2015 R.F. Smith <rsmith@xs4all.nl>. All rights reserved.
+# $Date: 2015-04-27 18:04:10 +0200 $
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+# 1. Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright
+#    notice, this list of conditions and the following disclaimer in the
+#    documentation and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY AUTHOR AND CONTRIBUTORS ``AS IS'' AND
+# ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED.  IN NO EVENT SHALL AUTHOR OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS
+# OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION)
+# HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY
+# OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF
+# SUCH DAMAGE.
+
+"""Columnar storage of drawing entities in numpy arrays.
+
+An EntityTable holds the same information as a list of ent.Line, ent.Arc and
+ent.Contour objects, but with one array per property instead of one object
+per entity. Operations on all entities are done in one go.
+"""
+
+import math
+import numpy as np
+from nctools import bbox, ent
+
+# Kinds of entities.
+LINE, ARC = 0, 1
+
+# Position of entities relative to a box, see EntityTable.classify.
+INSIDE, OUTSIDE, CROSSING = 0, 1, 2
+
+
+class EntityTable(object):
+    """A table of lines and arcs.
+
+    Every row is one entity. The columns are:
+
+    * kind: LINE or ARC.
+    * index: sequence number, -1 if unknown.
+    * layer: number of the layer name in the list layers.
+    * contour: number of the contour the entity belongs to, -1 if none.
+    * x, y: arrays of shape (N, 2) with the coordinates of the start and end
+      points.
+    * cx, cy, R: center and radius. Only meaningful for arcs.
+    * a: array of shape (N, 2) with the angles that the arc was created
+      with, in radians.
+    * sa, da: start angle and sweep of arcs, in radians. A negative sweep
+      means a clockwise arc.
+
+    The index and layer of every contour are kept in the arrays cindex and
+    clayer, in order of the contour numbers.
+    """
+
+    def __init__(self, n=0):
+        """Create an empty table.
+
+        :param n: number of rows
+        """
+        self.kind = np.zeros(n, dtype=np.uint8)
+        self.index = np.full(n, -1, dtype=np.int64)
+        self.layer = np.zeros(n, dtype=np.int32)
+        self.contour = np.full(n, -1, dtype=np.int32)
+        self.x = np.zeros((n, 2))
+        self.y = np.zeros((n, 2))
+        self.cx = np.zeros(n)
+        self.cy = np.zeros(n)
+        self.R = np.zeros(n)
+        self.a = np.zeros((n, 2))
+        self.sa = np.zeros(n)
+        self.da = np.zeros(n)
+        self.cindex = np.zeros(0, dtype=np.int64)
+        self.clayer = np.zeros(0, dtype=np.int32)
+        self.layers = []
+
+    def __len__(self):
+        return len(self.kind)
+
+    @classmethod
+    def fromentities(cls, entities):
+        """Create a table from a list of entities. The entities of contours
+        are stored as separate rows that share a contour number.
+
+        :param entities: list of ent.Line, ent.Arc and ent.Contour objects
+        :returns: an EntityTable
+        """
+        rows, contour, groups = [], [], []
+        names = {}
+        for e in entities:
+            if isinstance(e, ent.Contour):
+                rows += e.entities
+                contour += [len(groups)] * len(e.entities)
+                groups.append((-1 if e.index is None else e.index,
+                               names.setdefault(e.layer, len(names))))
+            else:
+                rows.append(e)
+                contour.append(-1)
+        t = cls(len(rows))
+        if groups:
+            t.cindex, t.clayer = (np.array(c) for c in zip(*groups))
+        for n, e in enumerate(rows):
+            t.index[n] = -1 if e.index is None else e.index
+            t.layer[n] = names.setdefault(e.layer, len(names))
+            t.x[n] = e.x
+            t.y[n] = e.y
+            if isinstance(e, ent.Arc):
+                t.kind[n] = ARC
+                t.cx[n], t.cy[n], t.R[n] = e.cx, e.cy, e.R
+                t.a[n] = e.a
+                t.sa[n], t.da[n] = e.sa, e.da
+        t.contour[:] = contour
+        t.layers = sorted(names, key=names.get)
+        return t
+
+    def entities(self):
+        """Convert the table to entity objects.
+
+        :returns: a list of ent.Line, ent.Arc and ent.Contour objects
+        """
+        rv, members, last = [], [], -1
+
+        def close():
+            if len(members) > 1:
+                index = self.cindex[last].item()
+                rv.append(ent.Contour(members, None if index < 0 else index,
+                                      self.layers[self.clayer[last]]))
+            else:
+                rv.extend(members)
+        cols = zip(self.kind.tolist(), self.index.tolist(),
+                   self.layer.tolist(), self.contour.tolist(),
+                   self.x.tolist(), self.y.tolist(), self.cx.tolist(),
+                   self.cy.tolist(), self.R.tolist(), self.a.tolist(),
+                   self.da.tolist())
+        for kind, index, la, cn, x, y, cx, cy, R, a, da in cols:
+            if index < 0:
+                index = None
+            layer = self.layers[la]
+            if kind == ARC:
+                e = ent.Arc(cx, cy, R, a[0], a[1], index, layer, da > 0)
+            else:
+                e = ent.Line(x[0], y[0], x[1], y[1], index, layer)
+            if cn != last:
+                close()
+                members = []
+            if cn < 0:
+                rv.append(e)
+            else:
+                members.append(e)
+            last = cn
+        close()
+        return rv
+
+    @property
+    def arcs(self):
+        """Boolean mask of the arcs in the table."""
+        return self.kind == ARC
+
+    def move(self, dx, dy):
+        """Move all entities.
+
+        :param dx: movement in the x direction
+        :param dy: movement in the y direction
+        """
+        self.x += dx
+        self.y += dy
+        arcs = self.arcs
+        self.cx[arcs] += dx
+        self.cy[arcs] += dy
+
+    def flip(self, mask=None):
+        """Reverse the direction of entities. Entities that are part of a
+        contour are not reversed, like ent.Contour.flip.
+
+        :param mask: boolean array selecting the entities to reverse. By
+            default all entities are reversed.
+        """
+        if mask is None:
+            mask = np.ones(len(self), dtype=bool)
+        mask = mask & (self.contour < 0)
+        self.x[mask] = self.x[mask, ::-1]
+        self.y[mask] = self.y[mask, ::-1]
+        arcs = mask & self.arcs
+        self.a[arcs] = self.a[arcs, ::-1]
+        self.sa[arcs] += self.da[arcs]
+        self.da[arcs] = -self.da[arcs]
+
+    def extents(self):
+        """Calculate the exact bounding box of every entity. For arcs the
+        extremes are found where the arc crosses the axes through its
+        center.
+
+        :returns: array of shape (N, 4) with the columns minx, maxx, miny,
+            maxy.
+        """
+        rv = np.empty((len(self), 4))
+        rv[:, 0], rv[:, 1] = self.x.min(axis=1), self.x.max(axis=1)
+        rv[:, 2], rv[:, 3] = self.y.min(axis=1), self.y.max(axis=1)
+        arcs = np.flatnonzero(self.arcs)
+        if len(arcs):
+            sa, da = self.sa[arcs], self.da[arcs]
+            start = np.where(da < 0, sa + da, sa)
+            sweep = np.abs(da)
+            cx, cy, R = self.cx[arcs], self.cy[arcs], self.R[arcs]
+            quad = np.arange(4) * (math.pi/2)
+            inside = np.mod(quad - start[:, None], 2*math.pi) <= sweep[:, None]
+            rv[arcs, 1] = np.where(inside[:, 0], cx + R, rv[arcs, 1])
+            rv[arcs, 3] = np.where(inside[:, 1], cy + R, rv[arcs, 3])
+            rv[arcs, 0] = np.where(inside[:, 2], cx - R, rv[arcs, 0])
+            rv[arcs, 2] = np.where(inside[:, 3], cy - R, rv[arcs, 2])
+        return rv
+
+    def classify(self, bb):
+        """Determine the position of the entities relative to a box.
+
+        Lines are clipped against the box with the Liang-Barsky algorithm.
+        An arc whose extents overlap the box but don't lie inside it
+        crosses the box if one of its end points lies in the box, or if the
+        circle meets an edge of the box within the sweep of the arc.
+        Otherwise it passes the box, for instance near a corner.
+
+        :param bb: a bbox.BBox
+        :returns: array with INSIDE, OUTSIDE or CROSSING for every entity
+        """
+        ex = self.extents()
+        inside = ((ex[:, 0] >= bb.minx) & (ex[:, 1] <= bb.maxx) &
+                  (ex[:, 2] >= bb.miny) & (ex[:, 3] <= bb.maxy))
+        apart = ((ex[:, 1] < bb.minx) | (ex[:, 0] > bb.maxx) |
+                 (ex[:, 3] < bb.miny) | (ex[:, 2] > bb.maxy))
+        rv = np.full(len(self), CROSSING, dtype=np.uint8)
+        rv[inside] = INSIDE
+        rv[apart] = OUTSIDE
+        # Lines whose extents overlap the box can still miss it.
+        check = np.flatnonzero(~inside & ~apart & ~self.arcs)
+        x0, y0 = self.x[check, 0], self.y[check, 0]
+        dx, dy = self.x[check, 1] - x0, self.y[check, 1] - y0
+        p = np.stack((-dx, dx, -dy, dy))
+        q = np.stack((x0 - bb.minx, bb.maxx - x0, y0 - bb.miny,
+                      bb.maxy - y0))
+        with np.errstate(divide='ignore', invalid='ignore'):
+            t = q / p
+        t0 = np.max(np.where(p < 0, t, 0.0), axis=0)
+        t1 = np.min(np.where(p > 0, t, 1.0), axis=0)
+        parallel = np.any((p == 0) & (q < 0), axis=0)
+        rv[check[parallel | (t0 > t1)]] = OUTSIDE
+        # The same for arcs.
+        check = np.flatnonzero(~inside & ~apart & self.arcs)
+        x, y = self.x[check], self.y[check]
+        ends = np.any((x >= bb.minx) & (x <= bb.maxx) &
+                      (y >= bb.miny) & (y <= bb.maxy), axis=1)
+        cx, cy, R = self.cx[check, None], self.cy[check, None], self.R[check]
+        da = self.da[check]
+        start = np.where(da < 0, self.sa[check] + da, self.sa[check])
+        # Points where the circle meets the lines through the edges; first
+        # the vertical edges, then the horizontal ones.
+        lx, ly = np.array([bb.minx, bb.maxx]), np.array([bb.miny, bb.maxy])
+        with np.errstate(invalid='ignore'):
+            hx = np.sqrt(R[:, None]**2 - (lx - cx)**2)
+            hy = np.sqrt(R[:, None]**2 - (ly - cy)**2)
+        lx, ly = np.broadcast_to(lx, hx.shape), np.broadcast_to(ly, hy.shape)
+        px = np.hstack((lx, lx, cx - hy, cx + hy))
+        py = np.hstack((cy - hx, cy + hx, ly, ly))
+        # Circles that miss a line give NaN, which compares as False.
+        on = ((px >= bb.minx) & (px <= bb.maxx) &
+              (py >= bb.miny) & (py <= bb.maxy))
+        ang = np.mod(np.arctan2(py - cy, px - cx) - start[:, None], 2*math.pi)
+        on &= ang <= np.abs(da)[:, None]
+        rv[check[~ends & ~np.any(on, axis=1)]] = OUTSIDE
+        return rv
+
+    @property
+    def bbox(self):
+        """The bounding box of all entities, as a bbox.BBox."""
+        ex = self.extents()
+        return bbox.BBox([(ex[:, 0].min(), ex[:, 2].min()),
+                          (ex[:, 1].max(), ex[:, 3].max())])
+
+    @property
+    def length(self):
+        """Array of the lengths of the entities."""
+        rv = np.hypot(self.x[:, 1] - self.x[:, 0], self.y[:, 1] - self.y[:, 0])
+        arcs = self.arcs
+        rv[arcs] = self.R[arcs] * np.abs(self.da[arcs])
+        return rv
+
+    def segments(self, devlim=1):
+        """Approximate all entities by line segments, like ent.Arc.segments.
+
+        :param devlim: Maximum distance that the line segments are to
+            deviate from the arcs.
+        :returns: an array of shape (M, 2) with the points of all entities
+            in order, and an array of N+1 offsets. The points of entity n are
+            points[offsets[n]:offsets[n+1]].
+        """
+        devlim = float(devlim)
+        arcs = self.arcs
+        cnt = np.ones(len(self), dtype=np.int64)
+        fine = arcs & (self.R >= devlim)
+        step = 2*np.arccos(1 - devlim/self.R[fine])
+        cnt[fine] = (np.abs(self.da[fine]/step) + 1).astype(np.int64)
+        offsets = np.zeros(len(self) + 1, dtype=np.int64)
+        np.cumsum(cnt + 1, out=offsets[1:])
+        row = np.repeat(np.arange(len(self)), cnt + 1)
+        i = np.arange(offsets[-1]) - offsets[row]
+        pnts = np.empty((offsets[-1], 2))
+        # Lines and arcs alike run from their start point to the end point.
+        last = i == cnt[row]
+        pnts[:, 0] = np.where(last, self.x[row, 1], self.x[row, 0])
+        pnts[:, 1] = np.where(last, self.y[row, 1], self.y[row, 0])
+        on = arcs[row]
+        r = row[on]
+        angs = self.sa[r] + i[on] * (self.da[r]/cnt[r])
+        pnts[on, 0] = self.cx[r] + self.R[r]*np.cos(angs)
+        pnts[on, 1] = self.cy[r] + self.R[r]*np.sin(angs)
+        return pnts, offsets
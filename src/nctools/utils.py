@@ -26,8 +26,10 @@
 """Utilities for nctools."""
 
 from datetime import datetime
+import argparse
 import glob
 import os.path
+import re
 
 
 class Msg(object):
@@ -65,6 +67,19 @@ def outname(inname, extension, addenum=''):
     return rv + addenum + extension
 
 
+def regex(expr):
+    """Compile a regular expression given as a command line argument.
+
+    :param expr: regular expression
+    :returns: compiled regular expression
+    """
+    try:
+        return re.compile(expr)
+    except re.error as ex:
+        raise argparse.ArgumentTypeError(
+            "invalid regular expression '{}': {}".format(expr, ex))
+
+
 def skip(error, filename):
     """Skip a file in case of an error
 
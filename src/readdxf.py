@@ -50,6 +50,14 @@ def main(argv):
     searching for contours (defaults to 0.5 mm)"""
     parser.add_argument('-l', '--limit', nargs='?', help=argtxt, dest='limit',
                         type=float, default=0.5)
+    argtxt2 = """regular expression that selects the layers to read
+    (defaults to all layers)"""
+    parser.add_argument('--layers', help=argtxt2, dest='layers',
+                        metavar='RE', type=utils.regex)
+    argtxt3 = """read the file without using or filling the cache of
+    parsed files"""
+    parser.add_argument('--no-cache', help=argtxt3, dest='cache',
+                        action='store_false')
     group = parser.add_mutually_exclusive_group()
     group.add_argument('-L', '--license', action=LicenseAction, nargs=0,
                        help="print the license")
@@ -66,7 +74,11 @@ def main(argv):
         sys.exit(0)
     for f in utils.xpand(pv.files):
         try:
-            entities = dxf.reader(f)
+            entities, bb = [], None
+            for e in dxf.iter_entities(f, layers=pv.layers,
+                                       cache=pv.cache):
+                entities.append(e)
+                bb = e.bbox if bb is None else bbox.merge([bb, e.bbox])
         except Exception as ex:
             utils.skip(ex, f)
             continue
@@ -77,8 +89,6 @@ def main(argv):
             sys.exit(1)
         if num > 1:
             msg.say('Contains: {} entities'.format(num))
-            bbe = [e.bbox for e in entities]
-            bb = bbox.merge(bbe)
             layers = {e.layer for e in entities}
             for layer in layers:
                 msg.say('Layer: "{}"'.format(layer))
@@ -94,7 +104,6 @@ def main(argv):
         else:
             msg.say('Contains: 1 entity')
             msg.say('Layer: "{}"'.format(entities[0].layer))
-            bb = entities[0].bbox
             parts.append(entities)
         es = 'Extents: {:.1f} ≤ x ≤ {:.1f}, {:.1f} ≤ y ≤ {:.1f}'
         msg.say(es.format(bb.minx, bb.maxx, bb.miny, bb.maxy))
@@ -0,0 +1,117 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Copyright © 2015 R.F. Smith <rsmith@xs4all.nl>. All rights reserved.
+# $Date: 2015-04-27 18:04:10 +0200 $
+# 
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+# 1. Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright
+#    notice, this list of conditions and the following disclaimer in the
+#    documentation and/or other materials provided with the distribution.
+# 
+# THIS SOFTWARE IS PROVIDED BY AUTHOR AND CONTRIBUTORS AS IS'' AND
+# ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED.  IN NO EVENT SHALL AUTHOR OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS
+# OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION)
+# HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY
+# OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF
+# SUCH DAMAGE.
+
+"""Benchmark for growing bounding boxes.
+
+Times BBox.update with single points, the way gerbernc.Writer.moveto uses
+it, next to the old update that rebuilt the BBox from a list of points.
+Also times bbox.merge and writing a complete NC file.
+
+Usage: python3 test/bench_bbox.py [points]
+"""
+
+import math
+import os
+import random
+import sys
+import tempfile
+import time
+sys.path.insert(0, 'src')
+from nctools import bbox, gerbernc  # noqa
+
+
+def rebuild(bb, p):
+    """The old BBox.update for a single 2D point.
+
+    :bb: BBox to grow
+    :p: a 2-tuple of numbers
+    """
+    tp = [p, (bb.minx, bb.miny), (bb.maxx, bb.maxy)]
+    bb.__init__(tp)
+
+
+def timed(func, *args):
+    """Call a function and measure how long it takes.
+
+    :func: function to call
+    :returns: time in seconds
+    """
+    start = time.perf_counter()
+    func(*args)
+    return time.perf_counter() - start
+
+
+def main(count):
+    """Entry point for this script.
+
+    :count: number of points
+    """
+    random.seed(42)
+    pnts = [(random.uniform(0, 1e5), random.uniform(0, 5e4))
+            for _ in range(count)]
+
+    def fast():
+        bb = bbox.BBox(pnts[0])
+        for p in pnts:
+            bb.update(p)
+
+    def slow():
+        bb = bbox.BBox(pnts[0])
+        for p in pnts:
+            rebuild(bb, p)
+
+    boxes = [bbox.BBox([p, (p[0]+10, p[1]+10)]) for p in pnts]
+
+    def oldmerge():
+        bbox.BBox([p for b in boxes for p in b.points])
+
+    def write(path):
+        with gerbernc.Writer(path) as w:
+            for n, (x, y) in enumerate(pnts):
+                if n % 50 == 0:
+                    w.up()
+                    w.moveto(x, y)
+                    w.down()
+                else:
+                    w.moveto(x + 5*math.cos(n), y + 5*math.sin(n))
+            w.up()
+
+    print('{} points'.format(count))
+    print('update: {:.3f} s, old update {:.3f} s'.format(timed(fast),
+                                                         timed(slow)))
+    print('merge: {:.3f} s, old merge {:.3f} s'.format(
+        timed(bbox.merge, boxes), timed(oldmerge)))
+    fd, path = tempfile.mkstemp(suffix='.nc')
+    os.close(fd)
+    try:
+        print('Writer: {:.3f} s'.format(timed(write, path)))
+    finally:
+        os.remove(path)
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 200000)
@@ -0,0 +1,154 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Copyright © 2015 R.F. Smith <rsmith@xs4all.nl>. All rights reserved.
+# $Date: 2015-04-27 18:04:10 +0200 $
+# 
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+# 1. Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright
+#    notice, this list of conditions and the following disclaimer in the
+#    documentation and/or other materials provided with the distribution.
+# 
+# THIS SOFTWARE IS PROVIDED BY AUTHOR AND CONTRIBUTORS AS IS'' AND
+# ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED.  IN NO EVENT SHALL AUTHOR OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS
+# OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION)
+# HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY
+# OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF
+# SUCH DAMAGE.
+
+"""Benchmark for finding contours in large layers.
+
+Builds synthetic layers of closed polygons whose segments are shuffled and
+randomly reversed, and times ent.findcontours on them. For the smaller
+layers the old linear-scan algorithm is timed as well, on its own copy of
+the entities. The old loop skipped some start entities because it removed
+entities from the list it iterated over, so it leaves more single entities
+and finds fewer contours.
+
+Usage: python3 test/bench_contours.py [size ...]
+"""
+
+import random
+import sys
+import time
+sys.path.insert(0, 'src')
+from nctools import ent  # noqa
+
+
+def layer(nseg, sides=10):
+    """Create a layer of shuffled polygons.
+
+    :nseg: number of segments
+    :sides: number of sides per polygon
+    :returns: list of ent.Line
+    """
+    rv = []
+    for n in range(nseg // sides):
+        ox, oy = (n % 300) * 30.0, (n // 300) * 30.0
+        pnts = [(ox + 10*random.random(), oy + 10*random.random())
+                for _ in range(sides)]
+        pnts.append(pnts[0])
+        for (x1, y1), (x2, y2) in zip(pnts, pnts[1:]):
+            ln = ent.Line(x1, y1, x2, y2)
+            if random.random() < 0.5:
+                ln.flip()
+            rv.append(ln)
+    random.shuffle(rv)
+    return rv
+
+
+def copy(ents):
+    """Make new lines with the same points, so that every search starts
+    with entities that haven't been flipped yet.
+
+    :ents: list of ent.Line
+    :returns: list of ent.Line
+    """
+    return [ent.Line(e.x[0], e.y[0], e.x[1], e.y[1]) for e in ents]
+
+
+def _contour(se, ents, lim):
+    """Find a contour in a list of entities, scanning all entities for every
+    step. This is the contour search as it was.
+
+    :se: starting entity
+    :ents: list of entities
+    :lim: maximum square of the distance between two points considered equal
+    """
+    ents.remove(se)
+    cl = [se]
+    while True:
+        # Look for connections at the end point
+        _, ep = cl[-1].points
+        ce = [e for e in ents if ent._chkdist(ep, e.points, lim)]
+        if ce:
+            newend = ce[0]
+            if ent._chkdist(ep, newend.points[1], lim):
+                newend.flip()
+            ents.remove(newend)
+            cl.append(newend)
+        else:
+            # Look for connections at the start point
+            sp, _ = cl[0].points
+            cs = [e for e in ents if ent._chkdist(sp, e.points, lim)]
+            if cs:
+                newstart = cs[0]
+                if ent._chkdist(sp, newstart.points[0], lim):
+                    newstart.flip()
+                ents.remove(newstart)
+                cl.insert(0, newstart)
+            else:
+                break
+    # If no additional entities are found, it's not a contour.
+    if len(cl) == 1:
+        ents.append(se)
+        return None
+    return ent.Contour(cl)
+
+
+def naive(ents, lim):
+    """Find contours in a list of entities like findcontours did before the
+    spatial hash.
+
+    :ents: list of entities
+    :lim: maximum square of the distance between two points considered equal
+    :returns: a list of contours and a list of remaining entities
+    """
+    contours = [_contour(e, ents, lim) for e in ents]
+    contours = [c for c in contours if c is not None]
+    return contours, ents
+
+
+def main(sizes):
+    """Entry point for this script.
+
+    :sizes: list of layer sizes
+    """
+    random.seed(42)
+    for size in sizes:
+        ents = layer(size)
+        start = time.perf_counter()
+        contours, rement = ent.findcontours(copy(ents), 0.25)
+        t = time.perf_counter() - start
+        fs = '{:7d} segments: grid {} contours, {} single, {:.3f} s'
+        msg = fs.format(len(ents), len(contours), len(rement), t)
+        if size <= 5000:
+            start = time.perf_counter()
+            contours, rement = naive(copy(ents), 0.25)
+            t = time.perf_counter() - start
+            fs = '; linear scan {} contours, {} single, {:.3f} s'
+            msg += fs.format(len(contours), len(rement), t)
+        print(msg)
+
+
+if __name__ == '__main__':
+    main([int(a) for a in sys.argv[1:]] or [1000, 5000, 20000, 100000])
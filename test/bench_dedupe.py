@@ -0,0 +1,57 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Copyright © 2015 R.F. Smith <rsmith@xs4all.nl>. All rights reserved.
+# $Date: 2015-04-27 18:04:10 +0200 $
+# 
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+# 1. Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright
+#    notice, this list of conditions and the following disclaimer in the
+#    documentation and/or other materials provided with the distribution.
+# 
+# THIS SOFTWARE IS PROVIDED BY AUTHOR AND CONTRIBUTORS AS IS'' AND
+# ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED.  IN NO EVENT SHALL AUTHOR OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS
+# OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION)
+# HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY
+# OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF
+# SUCH DAMAGE.
+
+"""Benchmark for removing overlapping lines.
+
+Times ent.dedupe on disjoint lines on the same straight line, like a dashed
+edge. Nothing is removed, but all lines end up in one group that is
+trimmed, so the time should grow about linearly with the number of lines.
+
+Usage: python3 test/bench_dedupe.py [size ...]
+"""
+
+import sys
+import time
+sys.path.insert(0, 'src')
+from nctools import ent  # noqa
+
+
+def main(sizes):
+    """Entry point for this script.
+
+    :sizes: list of numbers of lines
+    """
+    for size in sizes:
+        lines = [ent.Line(3*k, 0, 3*k + 2, 0) for k in range(size)]
+        start = time.perf_counter()
+        rv = ent.dedupe(lines)
+        t = time.perf_counter() - start
+        print('{:7d} lines: {} remaining, {:.3f} s'.format(size, len(rv), t))
+
+
+if __name__ == '__main__':
+    main([int(a) for a in sys.argv[1:]] or [2000, 8000, 16000, 64000])
@@ -0,0 +1,81 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Copyright © 2015 R.F. Smith <rsmith@xs4all.nl>. All rights reserved.
+# $Date: 2015-04-27 18:04:10 +0200 $
+# 
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+# 1. Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright
+#    notice, this list of conditions and the following disclaimer in the
+#    documentation and/or other materials provided with the distribution.
+# 
+# THIS SOFTWARE IS PROVIDED BY AUTHOR AND CONTRIBUTORS AS IS'' AND
+# ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED.  IN NO EVENT SHALL AUTHOR OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS
+# OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION)
+# HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY
+# OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF
+# SUCH DAMAGE.
+
+"""Benchmark for the memory used by entities.
+
+Reads the DXF files in the test directory without the cache, and reports
+the memory used by the entities and their contours per entity.
+
+Usage: python3 test/bench_memory.py [file ...]
+"""
+
+import glob
+import os
+import sys
+import tracemalloc
+os.environ['NCTOOLS_CACHE'] = ''
+sys.path.insert(0, 'src')
+from nctools import dxf, ent  # noqa
+
+
+def measure(name):
+    """Measure the memory used by the entities in a file.
+
+    :name: name of the DXF file
+    :returns: number of entities, bytes in use after reading the entities
+        and bytes in use after finding contours.
+    """
+    tracemalloc.start()
+    entities = dxf.reader(name)
+    size = tracemalloc.get_traced_memory()[0]
+    contours, rement = ent.findcontours(entities)
+    for e in entities:
+        e.bbox
+    total = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return len(entities), size, total
+
+
+def main(names):
+    """Entry point for this script.
+
+    :names: list of DXF files
+    """
+    fs = '{:32s} {:6d} entities, {:5.0f} bytes/entity, {:5.0f} with contours'
+    count, used, used2 = 0, 0, 0
+    for name in names:
+        n, size, total = measure(name)
+        if n == 0:
+            continue
+        print(fs.format(os.path.basename(name), n, size/n, total/n))
+        count, used, used2 = count + n, used + size, used2 + total
+    print(fs.format('all files', count, used/count, used2/count))
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:] or sorted(glob.glob('test/*.dxf') +
+                                glob.glob('test/*/*.dxf')))
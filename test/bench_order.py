@@ -0,0 +1,80 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Copyright © 2015 R.F. Smith <rsmith@xs4all.nl>. All rights reserved.
+# $Date: 2015-04-27 18:04:10 +0200 $
+# 
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+# 1. Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright
+#    notice, this list of conditions and the following disclaimer in the
+#    documentation and/or other materials provided with the distribution.
+# 
+# THIS SOFTWARE IS PROVIDED BY AUTHOR AND CONTRIBUTORS AS IS'' AND
+# ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED.  IN NO EVENT SHALL AUTHOR OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS
+# OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION)
+# HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY
+# OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF
+# SUCH DAMAGE.
+
+"""Benchmark for ordering cuts.
+
+Orders random lines on a 10 m × 2 m marker with order.reorder, and compares
+the distance moved with the knife raised to sorting by the minimum x and y
+like dxf2nc does without reordering.
+
+Usage: python3 test/bench_order.py [size ...]
+"""
+
+import sys
+import time
+import numpy as np
+sys.path.insert(0, 'src')
+from nctools import ent, order  # noqa
+
+
+def lines(count, rng):
+    """Create random lines of up to 100 mm on a 10 m × 2 m marker.
+
+    :count: number of lines
+    :rng: numpy random generator
+    :returns: list of ent.Line
+    """
+    p = rng.uniform(0, 1, (count, 2)) * (10000, 2000)
+    q = p + rng.uniform(-100, 100, (count, 2))
+    return [ent.Line(x0, y0, x1, y1, n)
+            for n, (x0, y0, x1, y1) in enumerate(np.hstack((p, q)).tolist())]
+
+
+def main(sizes, budget=1.0):
+    """Entry point for this script.
+
+    :sizes: list of numbers of lines
+    :budget: time budget for improving the order
+    """
+    rng = np.random.default_rng(42)
+    fs = ('{:6d} lines: sorted {:.0f} mm, nearest {:.0f} mm ({:.2f} s), '
+          'improved {:.0f} mm ({:.2f} s)')
+    for size in sizes:
+        le = lines(size, rng)
+        le.sort(key=lambda e: (e.bbox.minx, e.bbox.miny))
+        before = order.airdistance(le)
+        results = []
+        for b in (0, budget):
+            copy = [ent.Line(e.x[0], e.y[0], e.x[1], e.y[1]) for e in le]
+            start = time.perf_counter()
+            rv = order.reorder(copy, band=500, budget=b)
+            results += [order.airdistance(rv), time.perf_counter() - start]
+        print(fs.format(size, before, *results))
+
+
+if __name__ == '__main__':
+    main([int(a) for a in sys.argv[1:]] or [100, 1000, 10000])
@@ -0,0 +1,89 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Copyright © 2015 R.F. Smith <rsmith@xs4all.nl>. All rights reserved.
+# $Date: 2015-04-27 18:04:10 +0200 $
+# 
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+# 1. Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright
+#    notice, this list of conditions and the following disclaimer in the
+#    documentation and/or other materials provided with the distribution.
+# 
+# THIS SOFTWARE IS PROVIDED BY AUTHOR AND CONTRIBUTORS AS IS'' AND
+# ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED.  IN NO EVENT SHALL AUTHOR OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS
+# OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION)
+# HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY
+# OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF
+# SUCH DAMAGE.
+
+"""Benchmark for the spatial index.
+
+Builds a spatial.RTree over random boxes and times window queries,
+compared with testing every box (timed for 100 queries and scaled up), and
+nearest neighbour queries.
+
+Usage: python3 test/bench_spatial.py [size ...]
+"""
+
+import sys
+import time
+import numpy as np
+sys.path.insert(0, 'src')
+from nctools import spatial  # noqa
+
+
+def boxes(count, rng):
+    """Create random boxes on a 10 m × 2 m marker.
+
+    :count: number of boxes
+    :rng: numpy random generator
+    :returns: array of shape (count, 4)
+    """
+    lo = rng.uniform(0, 1, (count, 2)) * (10000, 2000)
+    size = rng.uniform(0, 50, (count, 2))
+    return np.column_stack((lo[:, 0], lo[:, 0] + size[:, 0],
+                            lo[:, 1], lo[:, 1] + size[:, 1]))
+
+
+def main(sizes, queries=1000):
+    """Entry point for this script.
+
+    :sizes: list of numbers of boxes
+    :queries: number of queries of each kind
+    """
+    rng = np.random.default_rng(42)
+    fs = ('{:8d} boxes: build {:.3f} s, {} windows {:.3f} s '
+          '(scan {:.3f} s), {} × 5 nearest {:.3f} s')
+    for size in sizes:
+        b = boxes(size, rng)
+        q = boxes(queries, rng)
+        start = time.perf_counter()
+        tree = spatial.RTree(b)
+        build = time.perf_counter() - start
+        start = time.perf_counter()
+        for minx, maxx, miny, maxy in q.tolist():
+            tree.window(minx, maxx, miny, maxy)
+        window = time.perf_counter() - start
+        start = time.perf_counter()
+        for minx, maxx, miny, maxy in q[:100].tolist():
+            np.flatnonzero((b[:, 0] <= maxx) & (b[:, 1] >= minx) &
+                           (b[:, 2] <= maxy) & (b[:, 3] >= miny))
+        scan = (time.perf_counter() - start) * queries / 100
+        start = time.perf_counter()
+        for x, _, y, _ in q.tolist():
+            tree.nearest(x, y, 5)
+        knn = time.perf_counter() - start
+        print(fs.format(size, build, queries, window, scan, queries, knn))
+
+
+if __name__ == '__main__':
+    main([int(a) for a in sys.argv[1:]] or [1000, 10000, 100000, 1000000])
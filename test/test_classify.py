@@ -0,0 +1,68 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Copyright © 2015 R.F. Smith <rsmith@xs4all.nl>. All rights reserved.
+# $Date: 2015-04-27 18:04:10 +0200 $
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+# 1. Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright
+#    notice, this list of conditions and the following disclaimer in the
+#    documentation and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY AUTHOR AND CONTRIBUTORS AS IS'' AND
+# ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED.  IN NO EVENT SHALL AUTHOR OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS
+# OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION)
+# HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY
+# OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF
+# SUCH DAMAGE.
+
+"""Regression tests for classifying entities relative to a box.
+
+Run with py.test, or as a script.
+"""
+
+import math
+import nctools.bbox as bbox
+import nctools.ent as ent
+import nctools.table as table
+
+box = bbox.BBox([(0, 0), (10, 10)])
+
+
+def _classify(entities):
+    return table.EntityTable.fromentities(entities).classify(box).tolist()
+
+
+def test_arc_near_corner():
+    """Arcs whose extents overlap a corner of the box but that pass it are
+    outside. Arcs that cut the corner cross.
+    """
+    q = math.pi/2
+    passing = [ent.Arc(13, 13, 4, 2*q, 3*q), ent.Arc(-3, -3, 4, 0, q)]
+    cutting = [ent.Arc(13, 13, 4.5, 2*q, 3*q), ent.Arc(-3, -3, 4.5, 0, q)]
+    assert _classify(passing) == [table.OUTSIDE]*2
+    assert _classify(cutting) == [table.CROSSING]*2
+
+
+def test_arc_around_box():
+    """An arc around the box is outside, even though the box lies in the
+    sector of the arc.
+    """
+    arcs = [ent.Arc(5, 5, 20, 0, 2*math.pi - 0.1),
+            ent.Arc(5, 5, 2, 0, math.pi)]
+    assert _classify(arcs) == [table.OUTSIDE, table.INSIDE]
+
+
+if __name__ == '__main__':
+    test_arc_near_corner()
+    test_arc_around_box()
+    print('ok')
@@ -0,0 +1,83 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Copyright © 2015 R.F. Smith <rsmith@xs4all.nl>. All rights reserved.
+# $Date: 2015-04-27 18:04:10 +0200 $
+# 
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+# 1. Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright
+#    notice, this list of conditions and the following disclaimer in the
+#    documentation and/or other materials provided with the distribution.
+# 
+# THIS SOFTWARE IS PROVIDED BY AUTHOR AND CONTRIBUTORS AS IS'' AND
+# ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED.  IN NO EVENT SHALL AUTHOR OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS
+# OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION)
+# HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY
+# OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF
+# SUCH DAMAGE.
+
+"""Regression tests for removing overlapping lines and arcs.
+
+Run with py.test, or as a script.
+"""
+
+import math
+import itertools
+import nctools.ent as ent
+
+
+def _dist(p, e):
+    """Find the distance from a point to a line or arc."""
+    if isinstance(e, ent.Arc):
+        a = math.atan2(p[1] - e.cy, p[0] - e.cx)
+        if ((a - e.sa) % (2*math.pi) <= e.da if e.ccw else
+                (e.sa - a) % (2*math.pi) <= -e.da):
+            return math.fabs(math.hypot(p[0] - e.cx, p[1] - e.cy) - e.R)
+        return min(math.hypot(p[0] - x, p[1] - y) for x, y in e.points)
+    (x0, y0), (x1, y1) = e.points
+    dx, dy = x1 - x0, y1 - y0
+    t = ((p[0] - x0)*dx + (p[1] - y0)*dy)/(dx*dx + dy*dy)
+    t = min(max(t, 0.0), 1.0)
+    return math.hypot(p[0] - x0 - t*dx, p[1] - y0 - t*dy)
+
+
+def _check(entities, lim=0.25):
+    """Check that every end point of the original entities is within the
+    tolerance of the remaining ones.
+    """
+    rv = ent.dedupe(entities, lim)
+    for e in entities:
+        for p in e.points:
+            assert min(_dist(p, r) for r in rv) <= math.sqrt(lim), p
+    return rv
+
+
+def test_dropped_part_not_covered():
+    """A part of a line that is too short to keep must not remove the
+    overlapping part of a later line.
+    """
+    spans = [(-90.92, -3.15), (-91.26, -90.23), (-91.66, -32.54)]
+    for order in itertools.permutations(spans):
+        _check([ent.Line(a, 8.66, b, 8.66) for a, b in order])
+
+
+def test_dropped_arc_not_covered():
+    """The same for arcs on the same circle."""
+    spans = [(0.5, 1.5), (0.48, 0.54), (0.46, 1.0)]
+    for order in itertools.permutations(spans):
+        _check([ent.Arc(0, 0, 20, a, b) for a, b in order])
+
+
+if __name__ == '__main__':
+    test_dropped_part_not_covered()
+    test_dropped_arc_not_covered()
+    print('ok')
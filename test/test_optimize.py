@@ -0,0 +1,109 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Copyright © 2015 R.F. Smith <rsmith@xs4all.nl>. All rights reserved.
+# $Date: 2015-04-27 18:04:10 +0200 $
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+# 1. Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright
+#    notice, this list of conditions and the following disclaimer in the
+#    documentation and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY AUTHOR AND CONTRIBUTORS AS IS'' AND
+# ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED.  IN NO EVENT SHALL AUTHOR OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS
+# OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION)
+# HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY
+# OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF
+# SUCH DAMAGE.
+
+"""Regression tests for the optimizer of NC command streams.
+
+Run with py.test, or as a script.
+"""
+
+import os
+import tempfile
+import numpy as np
+import nctools.gerbernc as gerbernc
+
+here = os.path.dirname(os.path.abspath(__file__))
+
+
+def _segments(paths):
+    """Get the straight cut segments of a Paths tuple.
+
+    :returns: two arrays of shape (N, 2) with the start and end points
+    """
+    A, B = [], []
+    for a, b in zip(paths.offsets[:-1], paths.offsets[1:]):
+        p = paths.cuts[a:b]
+        if len(p) == 1:
+            p = np.vstack((p, p))
+        A.append(p[:-1])
+        B.append(p[1:])
+    return np.concatenate(A), np.concatenate(B)
+
+
+def _distances(points, A, B):
+    """Find the distance from every point to the nearest segment."""
+    rv = []
+    d = B - A
+    L2 = np.maximum(np.sum(d*d, axis=1), 1e-12)
+    for k in range(0, len(points), 500):
+        p = points[k:k+500, None, :]
+        t = np.clip(np.sum((p - A)*d, axis=2)/L2, 0.0, 1.0)
+        q = A + t[:, :, None]*d
+        rv.append(np.min(np.hypot(*(p - q).T), axis=0))
+    return np.concatenate(rv)
+
+
+def test_cuts_within_tolerance():
+    """Every point of the original cuts lies within the tolerance of the
+    optimized cuts.
+    """
+    tol = 0.5
+    rd = gerbernc.Reader(os.path.join(here, 'gerber-busgang-mm.nc'))
+    stats = {}
+    blocks = gerbernc.optimize(rd.commands, tol, 60, stats)
+    with tempfile.TemporaryDirectory() as tmp:
+        ofn = os.path.join(tmp, 'opt.nc')
+        with open(ofn, 'w') as out:
+            out.write('*'.join(rd.header))
+            for c in blocks:
+                out.write('*' + c)
+        opt = gerbernc.Reader(ofn).paths()
+    assert sum(stats.values()) > 0
+    before = rd.paths()
+    assert len(opt.cuts) < len(before.cuts)
+    assert np.max(_distances(before.cuts, *_segments(opt))) <= tol
+
+
+def test_lift_at_corner():
+    """Raising and lowering the knife is removed where the cut goes on
+    in nearly the same direction, and kept at a sharp corner.
+    """
+    straight = ['X0Y0', 'M14', 'X100Y0', 'M15', 'M14', 'X200Y10', 'M15']
+    stats = {}
+    rv = list(gerbernc.optimize(iter(straight), anglim=60, stats=stats))
+    assert rv == ['X0Y0', 'M14', 'X100Y0', 'X200Y10', 'M15']
+    assert stats['travel'] == 2
+    corner = ['X0Y0', 'M14', 'X100Y0', 'M15', 'M14', 'X100Y100', 'M15']
+    stats = {}
+    rv = list(gerbernc.optimize(iter(corner), anglim=60, stats=stats))
+    assert rv == corner
+    assert stats['travel'] == 0
+
+
+if __name__ == '__main__':
+    test_cuts_within_tolerance()
+    test_lift_at_corner()
+    print('ok')
@@ -0,0 +1,100 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Copyright © 2015 R.F. Smith <rsmith@xs4all.nl>. All rights reserved.
+# $Date: 2015-04-27 18:04:10 +0200 $
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+# 1. Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright
+#    notice, this list of conditions and the following disclaimer in the
+#    documentation and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY AUTHOR AND CONTRIBUTORS AS IS'' AND
+# ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED.  IN NO EVENT SHALL AUTHOR OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS
+# OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION)
+# HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY
+# OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF
+# SUCH DAMAGE.
+
+"""Regression tests for choosing the seams of closed contours.
+
+Run with py.test, or as a script.
+"""
+
+import math
+import tracemalloc
+import numpy as np
+import nctools.ent as ent
+import nctools.order as order
+
+
+def _polygon(cx, cy, R, count, rng):
+    """Create a closed contour of lines through random points on a circle."""
+    a = np.sort(rng.uniform(0, 2*math.pi, count))
+    x, y = cx + R*np.cos(a), cy + R*np.sin(a)
+    x, y = np.append(x, x[0]), np.append(y, y[0])
+    return ent.Contour([ent.Line(x[k], y[k], x[k+1], y[k+1])
+                        for k in range(count)])
+
+
+def _dense(exits, cost, entries):
+    """The cost of every combination at once, as a reference."""
+    d = np.hypot(entries[None, :, 0] - exits[:, None, 0],
+                 entries[None, :, 1] - exits[:, None, 1])
+    d += cost[:, None]
+    best = np.argmin(d, axis=0)
+    return d[best, np.arange(len(entries))]
+
+
+def test_link_matches_dense():
+    """The blocked search gives the same costs as the full matrix."""
+    rng = np.random.default_rng(1)
+    for n, m in ((1, 7), (300, 200), (50, 1000)):
+        exits = rng.uniform(0, 100, (n, 2))
+        cost = rng.uniform(0, 100, n)
+        entries = rng.uniform(0, 100, (m, 2))
+        low, best = order._link(exits, cost, entries, size=1000)
+        assert np.allclose(low, _dense(exits, cost, entries))
+        d = np.hypot(*(entries - exits[best]).T) + cost[best]
+        assert np.allclose(low, d)
+
+
+def test_large_contours():
+    """Two closed contours of 5000 vertices don't need the full matrix of
+    combinations.
+    """
+    rng = np.random.default_rng(2)
+    entities = [_polygon(0, 0, 100, 5000, rng),
+                _polygon(300, 0, 100, 5000, rng)]
+    tracemalloc.start()
+    order.seams(entities, anglim=60)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    assert peak < 32*2**20, peak
+    # Compare with all combinations, 500 vertices of the first contour at a
+    # time. No vertex is a sharp corner here.
+    rng = np.random.default_rng(2)
+    a = _polygon(0, 0, 100, 5000, rng)
+    b = _polygon(300, 0, 100, 5000, rng)
+    A, B = order._vertices(a)[0], order._vertices(b)[0]
+    best = math.inf
+    for k in range(0, len(A), 500):
+        rows = A[k:k+500]
+        cost = np.hypot(*rows.T)
+        best = min(best, _dense(rows, cost, B).min())
+    assert math.isclose(order.airdistance(entities), best)
+
+
+if __name__ == '__main__':
+    test_link_matches_dense()
+    test_large_contours()
+    print('ok')
@@ -0,0 +1,111 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Copyright © 2015 R.F. Smith <rsmith@xs4all.nl>. All rights reserved.
+# $Date: 2015-04-27 18:04:10 +0200 $
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+# 1. Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright
+#    notice, this list of conditions and the following disclaimer in the
+#    documentation and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY AUTHOR AND CONTRIBUTORS AS IS'' AND
+# ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED.  IN NO EVENT SHALL AUTHOR OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS
+# OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION)
+# HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY
+# OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF
+# SUCH DAMAGE.
+
+"""Regression tests for assembling entities into the fewest trails.
+
+Run with py.test, or as a script.
+"""
+
+import math
+import nctools.ent as ent
+
+lim = 0.25
+
+
+def _square(x0, y0, size):
+    """Create the four sides of a square, in no particular order or
+    direction.
+    """
+    x1, y1 = x0 + size, y0 + size
+    return [ent.Line(x0, y0, x1, y0), ent.Line(x0, y1, x1, y1),
+            ent.Line(x1, y1, x1, y0), ent.Line(x0, y0, x0, y1)]
+
+
+def _check(entities, count, closed=False):
+    """Assemble the entities and check the trails.
+
+    :entities: list of entities that form one connected graph
+    :count: expected number of trails
+    :closed: True if there should be one trail that ends where it starts
+    :returns: the list of trails, each a list of entities
+    """
+    before = [id(e) for e in entities]
+    contours, rement = ent.findtrails(entities, lim)
+    trails = [list(c.entities) for c in contours] + [[e] for e in rement]
+    # Every entity is used exactly once.
+    assert sorted(id(e) for t in trails for e in t) == sorted(before)
+    # Consecutive entities meet.
+    for t in trails:
+        for a, b in zip(t, t[1:]):
+            assert ent._dist2(a.points[1], b.points[0]) <= lim
+    assert len(trails) == count
+    if closed:
+        assert ent._dist2(trails[0][-1].points[1],
+                          trails[0][0].points[0]) <= lim
+    return trails
+
+
+def test_t_junction():
+    """Four nodes of odd degree give two open trails."""
+    _check([ent.Line(0, 0, 10, 0), ent.Line(0, 0, -10, 0),
+            ent.Line(0, 10, 0, 0)], 2)
+
+
+def test_shared_edge():
+    """Two closed loops that share an edge have two nodes of odd degree,
+    so they can be cut as a single open trail.
+    """
+    left = _square(0, 0, 10)
+    right = [e for e in _square(10, 0, 10) if e.points[0][0] != 10 or
+             e.points[1][0] != 10]
+    trails = _check(left + right, 1)
+    ends = {trails[0][0].points[0], trails[0][-1].points[1]}
+    assert ends == {(10, 0), (10, 10)}
+
+
+def test_figure_eight():
+    """Two closed loops that touch at a corner have only nodes of even
+    degree, and become one closed trail.
+    """
+    _check(_square(0, 0, 10) + _square(10, 10, 10), 1, True)
+
+
+def test_full_circle():
+    """A lone full circle is a closed trail of its own, and so is a circle
+    made of two halves.
+    """
+    _check([ent.Arc(0, 0, 5, 0, 2*math.pi)], 1, True)
+    _check([ent.Arc(0, 0, 5, 0, math.pi),
+            ent.Arc(0, 0, 5, math.pi, 2*math.pi)], 1, True)
+
+
+if __name__ == '__main__':
+    test_t_junction()
+    test_shared_edge()
+    test_figure_eight()
+    test_full_circle()
+    print('ok')